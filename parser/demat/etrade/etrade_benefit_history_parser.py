@@ -3,6 +3,7 @@ import os
 from utils.runtime_utils import warn_missing_module
 from utils import logger, file_utils, date_utils, share_data_utils
 from utils.date_utils import CalendarMode
+from utils.excel_utils import ReportReader, open_report, to_float
 from utils.ticker_mapping import ticker_currency_info
 
 warn_missing_module("pandas")
@@ -24,6 +25,16 @@ PURCHASES_OUTPUT_FILE_NAME = "purchases_etrade_benefit_history.json"
 ESPP_SHEET_NAME = "ESPP"
 RSU_SHEET_NAME = "Restricted Stock"
 
+# the only columns read out of the sheets, which carry dozens more
+ESPP_COLUMNS = (
+    "Record Type",
+    "Symbol",
+    "Purchase Date",
+    "Net Shares",
+    "Purchase Date FMV",
+)
+RSU_COLUMNS = ("Record Type", "Symbol", "Event Type", "Date", "Qty. or Amount")
+
 
 def parse_espp_row(data: pd.Series) -> t.Optional[TransactionWithTicker]:
     if data["Record Type"] == "Purchase":
@@ -43,101 +54,193 @@ def parse_espp_row(data: pd.Series) -> t.Optional[TransactionWithTicker]:
                 # live balance on top of that - it drops (often to 0 for old
                 # purchases) once shares are later sold - so it's tracked
                 # separately as closing_quantity, not used as the original qty.
-                quantity=float(data["Net Shares"]),
+                quantity=to_float(data["Net Shares"]),
             ),
             ticker=data["Symbol"].lower(),
         )
     return None
 
 
+def __parse_dates(dates: pd.Series, date_format: str) -> t.List[date_utils.DateObj]:
+    """
+    Parses a whole column of dates at once, into the same objects the row parsers
+    of `date_utils` build one at a time
+    """
+    date_times = pd.to_datetime(dates, format=date_format)
+    return [
+        {
+            "time_in_millis": time_in_millis,
+            "disp_time": disp_time,
+            "orig_disp_time": orig_disp_time,
+        }
+        for time_in_millis, disp_time, orig_disp_time in zip(
+            date_times.dt.as_unit("ms").astype("int64").tolist(),
+            date_times.dt.strftime("%d-%b-%Y").tolist(),
+            dates.tolist(),
+        )
+    ]
+
+
 def parse_espp(
-    xl: pd.ExcelFile, time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs]
+    xl: ReportReader, time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs]
 ) -> t.List[TransactionWithTicker]:
     logger.debug_log(f"Currently parsing {ESPP_SHEET_NAME} sheet")
-    sheet_pd = xl.parse(sheet_name=ESPP_SHEET_NAME, skiprows=0, header=0)
-    purchases = []
-    for _, data in sheet_pd.iterrows():
-        parsed_purchase = parse_espp_row(data)
-        if parsed_purchase is not None:
-            purchases.append(parsed_purchase)
-    return purchases
+    sheet_pd = xl.parse(
+        sheet_name=ESPP_SHEET_NAME, skiprows=0, header=0, usecols=ESPP_COLUMNS
+    )
+    # same purchases as `parse_espp_row` builds, but with every column converted
+    # at once rather than cell by cell
+    purchases_pd = sheet_pd[sheet_pd["Record Type"] == "Purchase"]
+    if purchases_pd.empty:
+        return []
+    tickers = purchases_pd["Symbol"].str.lower().tolist()
+    return [
+        TransactionWithTicker(
+            purchase=Transaction(
+                date=purchase_date,
+                fmv=Price(fmv, ticker_currency_info[ticker]),
+                # "Net Shares" rather than "Purchased Qty.", see `parse_espp_row`
+                quantity=quantity,
+            ),
+            ticker=ticker,
+        )
+        for ticker, purchase_date, fmv, quantity in zip(
+            tickers,
+            __parse_dates(purchases_pd["Purchase Date"], "%d-%b-%Y"),
+            purchases_pd["Purchase Date FMV"].str[1:].astype(float).tolist(),
+            map(to_float, purchases_pd["Net Shares"].tolist()),
+        )
+    ]
+
+
+def __build_rsu_purchase(
+    quantity: float,
+    ticker_in_lower: str,
+    release_date: date_utils.DateObj,
+    fmv: float,
+) -> TransactionWithTicker:
+    return TransactionWithTicker(
+        purchase=Transaction(
+            date=release_date,
+            fmv=Price(fmv, ticker_currency_info[ticker_in_lower]),
+            quantity=quantity,
+        ),
+        ticker=ticker_in_lower,
+    )
 
 
 def parse_rsu_row(data: pd.Series, ticker: str) -> t.Optional[TransactionWithTicker]:
     if data["Event Type"] == "Shares released":
         ticker_in_lower = ticker.lower()
-        return TransactionWithTicker(
-            purchase=Transaction(
-                date=date_utils.parse_mm_dd(data["Date"]),
-                fmv=Price(
-                    share_data_utils.get_fmv(
-                        ticker_in_lower,
-                        date_utils.parse_mm_dd(data["Date"])["time_in_millis"],
-                    ),
-                    ticker_currency_info[ticker_in_lower],
-                ),
-                quantity=data["Qty. or Amount"],
-            ),
-            ticker=ticker_in_lower,
+        release_date = date_utils.parse_mm_dd(data["Date"])
+        return __build_rsu_purchase(
+            to_float(data["Qty. or Amount"]),
+            ticker_in_lower,
+            release_date,
+            share_data_utils.get_fmv(ticker_in_lower, release_date["time_in_millis"]),
         )
     return None
 
 
 def parse_rsu(
-    xl: pd.ExcelFile,
+    xl: ReportReader,
     time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
 ) -> list[TransactionWithTicker]:
     logger.debug_log(f"Currently parsing {RSU_SHEET_NAME} sheet")
-    sheet_pd = xl.parse(sheet_name=RSU_SHEET_NAME, skiprows=0, header=0)
-    purchases: t.List[TransactionWithTicker] = []
-    current_ticker = None
-    for _, data in sheet_pd.iterrows():
-        if data["Record Type"] == "Grant":
-            current_ticker = data["Symbol"].lower()
-        if data["Event Type"] == "Shares released":
-            if not date_utils.is_in_bounds(
-                date_utils.parse_mm_dd(data["Date"])["time_in_millis"],
-                time_bounds_in_ms,
-            ):
-                continue
-            assert current_ticker is not None, (
-                f"There is RSU event({data["Event Type"]}) without Grant event(which contains the ticker info)"
-                + f" hence no ticker info is found while parsing {RSU_SHEET_NAME}"
+    sheet_pd = xl.parse(
+        sheet_name=RSU_SHEET_NAME, skiprows=0, header=0, usecols=RSU_COLUMNS
+    )
+    # every event belongs to the grant listed last above it, which holds the ticker
+    grant_tickers = sheet_pd["Symbol"].where(sheet_pd["Record Type"] == "Grant").ffill()
+    released = sheet_pd["Event Type"] == "Shares released"
+    releases_pd = sheet_pd[released]
+    if releases_pd.empty:
+        return []
+    # `(quantity, ticker in lower case, release date)` of every release in bounds
+    releases: t.List[t.Tuple[float, str, date_utils.DateObj]] = []
+    # the column also carries the "$" amounts of other events, which leaves it read
+    # as text out of a CSV export
+    for quantity, ticker, release_date in zip(
+        map(to_float, releases_pd["Qty. or Amount"].tolist()),
+        grant_tickers[released].tolist(),
+        __parse_dates(releases_pd["Date"], "%m/%d/%Y"),
+    ):
+        if not date_utils.is_in_bounds(
+            release_date["time_in_millis"],
+            time_bounds_in_ms,
+        ):
+            continue
+        assert isinstance(ticker, str), (
+            f"There is RSU event(Shares released) without Grant event(which contains the ticker info)"
+            + f" hence no ticker info is found while parsing {RSU_SHEET_NAME}"
+        )
+        releases.append((quantity, ticker.lower(), release_date))
+
+    # the releases of a ticker resolve their FMVs together, in one search of its
+    # price history
+    ticker_fmvs: t.Dict[str, t.Iterator[share_data_utils.TimedFmv]] = {}
+    for ticker in dict.fromkeys(ticker for _, ticker, _ in releases):
+        ticker_fmvs[ticker] = iter(
+            share_data_utils.get_fmv_many(
+                ticker,
+                [
+                    release_date["time_in_millis"]
+                    for _, release_ticker, release_date in releases
+                    if release_ticker == ticker
+                ],
             )
-            parsed_purchase = parse_rsu_row(data, current_ticker)
-            if parsed_purchase is not None:
-                purchases.append(parsed_purchase)
-    return purchases
+        )
+    return [
+        __build_rsu_purchase(
+            quantity, ticker, release_date, next(ticker_fmvs[ticker])["fmv"]
+        )
+        for quantity, ticker, release_date in releases
+    ]
 
 
-def parse(
+def read_purchases(
     input_file_abs_path: str,
-    output_folder_abs_path: str,
-    operation_mode: str,
-    calendar_mode: CalendarMode,
-    assessment_year: int,
     time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
-) -> SectionDataMap:
+) -> t.Optional[t.List[TransactionWithTicker]]:
+    """
+    Every ESPP purchase and RSU release of the benefit history, None when the
+    workbook has neither sheet
+    """
     logger.DEBUG = DEBUG
     purchases: t.List[TransactionWithTicker] = []
-    with pd.ExcelFile(input_file_abs_path, engine="openpyxl") as xl:
+    with open_report(input_file_abs_path) as xl:
         sheet_names = xl.sheet_names
         logger.log(f"Total sheets being process {sheet_names}")
         if ESPP_SHEET_NAME not in sheet_names and RSU_SHEET_NAME not in sheet_names:
             logger.log(
                 f"Excel sheet don't have either {ESPP_SHEET_NAME} or {RSU_SHEET_NAME}"
             )
-            return SectionDataMap()
-        espp_purchases = parse_espp(xl, time_bounds_in_ms)
-        purchases.extend(espp_purchases)
+            return None
+        # a CSV export carries one of the sheets only, the other one being given
+        # as an input of its own
+        if ESPP_SHEET_NAME in sheet_names:
+            espp_purchases = parse_espp(xl, time_bounds_in_ms)
+            purchases.extend(espp_purchases)
 
-        rsu_purchases = parse_rsu(xl, time_bounds_in_ms)
-        purchases.extend(rsu_purchases)
+        if RSU_SHEET_NAME in sheet_names:
+            rsu_purchases = parse_rsu(xl, time_bounds_in_ms)
+            purchases.extend(rsu_purchases)
 
         # logger.log_json(espp_purchases)
         # logger.log_json(rsu_purchases)
+    return purchases
+
 
-    purchases.sort(
+def parse_purchases(
+    purchases: t.List[TransactionWithTicker],
+    output_folder_abs_path: str,
+    operation_mode: str,
+    calendar_mode: CalendarMode,
+    assessment_year: int,
+) -> SectionDataMap:
+    logger.DEBUG = DEBUG
+    purchases = sorted(
+        purchases,
         key=lambda purchase: purchase.purchase.date["time_in_millis"],
     )
     file_utils.write_to_file(
@@ -167,3 +270,23 @@ def parse(
         assessment_year,
         output_folder_abs_path,
     )
+
+
+def parse(
+    input_file_abs_path: str,
+    output_folder_abs_path: str,
+    operation_mode: str,
+    calendar_mode: CalendarMode,
+    assessment_year: int,
+    time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
+) -> SectionDataMap:
+    purchases = read_purchases(input_file_abs_path, time_bounds_in_ms)
+    if purchases is None:
+        return SectionDataMap()
+    return parse_purchases(
+        purchases,
+        output_folder_abs_path,
+        operation_mode,
+        calendar_mode,
+        assessment_year,
+    )
@@ -5,6 +5,7 @@ from utils.runtime_utils import warn_missing_module
 from utils.ticker_mapping import ticker_currency_info
 from utils import logger, file_utils, date_utils
 from utils.date_utils import CalendarMode
+from utils.excel_utils import ReportReader, open_report, to_float
 
 warn_missing_module("pandas")
 warn_missing_module("openpyxl")
@@ -24,6 +25,9 @@ PURCHASES_OUTPUT_FILE_NAME = "purchases_etrade_holdings_bystatus.json"
 
 SELLABLE_SHEET_NAME = "Sellable"
 
+# the only columns read out of the sheet, which carries dozens more
+SELLABLE_COLUMNS = ("Symbol", "Date Acquired", "Purchase Date FMV", "Sellable Qty.")
+
 
 def parse_sellable_row(data: pd.Series) -> t.Optional[TransactionWithTicker]:
     logger.debug_log(f"Currently parsing {type(data['Date Acquired'])} row")
@@ -38,15 +42,17 @@ def parse_sellable_row(data: pd.Series) -> t.Optional[TransactionWithTicker]:
                 float(data["Purchase Date FMV"][1:]),
                 ticker_currency_info[data["Symbol"].lower()],
             ),
-            quantity=data["Sellable Qty."],
+            quantity=to_float(data["Sellable Qty."]),
         ),
         ticker=data["Symbol"].lower(),
     )
 
 
-def parse_sellable(xl: pd.ExcelFile) -> t.List[TransactionWithTicker]:
+def parse_sellable(xl: ReportReader) -> t.List[TransactionWithTicker]:
     logger.debug_log(f"Currently parsing {SELLABLE_SHEET_NAME} sheet")
-    sheet_pd = xl.parse(sheet_name=SELLABLE_SHEET_NAME, skiprows=0, header=0)
+    sheet_pd = xl.parse(
+        sheet_name=SELLABLE_SHEET_NAME, skiprows=0, header=0, usecols=SELLABLE_COLUMNS
+    )
     purchases = []
     for _, data in sheet_pd.iterrows():
         parsed_purchase = parse_sellable_row(data)
@@ -55,25 +61,30 @@ def parse_sellable(xl: pd.ExcelFile) -> t.List[TransactionWithTicker]:
     return purchases
 
 
-def parse(
+def read_purchases(
     input_file_abs_path: str,
-    output_folder_abs_path: str,
-    operation_mode: str,
-    calendar_mode: CalendarMode,
-    assessment_year: int,
-) -> SectionDataMap:
+) -> t.Optional[t.List[TransactionWithTicker]]:
+    """
+    Every holding still sellable, None when the workbook has no sellable sheet
+    """
     logger.DEBUG = DEBUG
-    purchases: t.List[TransactionWithTicker] = []
-    with pd.ExcelFile(input_file_abs_path, engine="openpyxl") as xl:
+    with open_report(input_file_abs_path) as xl:
         sheet_names = xl.sheet_names
         logger.log(f"Total sheets being process {sheet_names}")
         if SELLABLE_SHEET_NAME not in sheet_names:
             logger.log(f"Excel sheet don't have either {SELLABLE_SHEET_NAME}")
-            return SectionDataMap()
-        purchases = parse_sellable(xl)
+            return None
+        return parse_sellable(xl)
 
-        # logger.log_json(espp_purchases)
-        # logger.log_json(rsu_purchases)
+
+def parse_purchases(
+    purchases: t.List[TransactionWithTicker],
+    output_folder_abs_path: str,
+    operation_mode: str,
+    calendar_mode: CalendarMode,
+    assessment_year: int,
+) -> SectionDataMap:
+    logger.DEBUG = DEBUG
 
     # purchases.sort(
     #    key=lambda purchase: purchase.date["time_in_millis"],
@@ -105,3 +116,22 @@ def parse(
         assessment_year,
         output_folder_abs_path,
     )
+
+
+def parse(
+    input_file_abs_path: str,
+    output_folder_abs_path: str,
+    operation_mode: str,
+    calendar_mode: CalendarMode,
+    assessment_year: int,
+) -> SectionDataMap:
+    purchases = read_purchases(input_file_abs_path)
+    if purchases is None:
+        return SectionDataMap()
+    return parse_purchases(
+        purchases,
+        output_folder_abs_path,
+        operation_mode,
+        calendar_mode,
+        assessment_year,
+    )
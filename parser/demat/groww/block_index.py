@@ -0,0 +1,69 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+
+from utils.runtime_utils import warn_missing_module
+from utils.excel_utils import cell_texts
+
+warn_missing_module("numpy")
+warn_missing_module("pandas")
+import numpy as np
+import pandas as pd
+import typing as t
+
+
+@dataclass(frozen=True)
+class BlockIndex:
+    """
+    Rows of a Groww statement sheet that its blocks are cut at, all located by one
+    pass over the first column. A block starts at its label, is followed by its
+    header row and runs up to the next blank row or label
+    """
+
+    # `(row index, label)` of every label, in the order the sheet holds them
+    labels: t.List[t.Tuple[int, str]]
+    header_row_indices: t.List[int]
+    # blank rows and labels, either of which closes the block above it
+    boundary_row_indices: t.List[int]
+    row_count: int
+
+    def first_label_row(self, label: str) -> t.Optional[int]:
+        return next(
+            (row_index for row_index, found in self.labels if found == label), None
+        )
+
+    def header_row_after(self, row_index: int) -> t.Optional[int]:
+        position = bisect_right(self.header_row_indices, row_index)
+        if position == len(self.header_row_indices):
+            return None
+        return self.header_row_indices[position]
+
+    def block_end_after(self, row_index: int) -> int:
+        """
+        Index of the first row past `row_index` that no longer belongs to its block
+        """
+        position = bisect_right(self.boundary_row_indices, row_index)
+        if position == len(self.boundary_row_indices):
+            return self.row_count
+        return self.boundary_row_indices[position]
+
+
+def build(sheet_pd: pd.DataFrame, labels: t.Collection[str], header: str) -> BlockIndex:
+    """
+    Index of a sheet whose blocks start with one of the labels in the first column,
+    `header` being the first column's name in every block's header row
+    """
+    texts = cell_texts(sheet_pd.iloc[:, :1])
+    first_column = (
+        texts.iloc[:, 0] if len(texts.columns) else pd.Series([""] * len(sheet_pd))
+    )
+    is_label = first_column.isin(labels).to_numpy()
+    is_blank = (first_column == "").to_numpy()
+    return BlockIndex(
+        labels=[
+            (int(row_index), str(first_column.iloc[row_index]))
+            for row_index in np.flatnonzero(is_label)
+        ],
+        header_row_indices=np.flatnonzero((first_column == header).to_numpy()).tolist(),
+        boundary_row_indices=np.flatnonzero(is_label | is_blank).tolist(),
+        row_count=len(sheet_pd),
+    )
@@ -5,6 +5,8 @@ from utils.excel_utils import (
     optional_cell_text,
     assert_sheet_names,
     to_float,
+    ReportReader,
+    open_report,
 )
 from models.transaction import Transaction, Price
 from models.asset_sale import (
@@ -13,6 +15,8 @@ from models.asset_sale import (
 )
 from models.section_type import SectionType
 from models.section_data import SectionDataMap
+from parser.demat.groww import block_index
+from parser.demat.groww.block_index import BlockIndex
 
 warn_missing_module("pandas")
 warn_missing_module("openpyxl")
@@ -92,12 +96,12 @@ def __is_long_term(short_term_gains: float, long_term_gains: float) -> bool:
 
 
 def __parse_row(
-    data: pd.Series,
+    data: t.Tuple[t.Any, ...],
     column_map: t.Dict[str, int],
     section_types: t.Tuple[SectionType, SectionType],
 ) -> AssetSale:
     def cell(header: str) -> t.Any:
-        return data.iloc[column_map[header]]
+        return data[column_map[header]]
 
     quantity = to_float(cell(QUANTITY_HEADER))
     purchase_date = date_utils.parse_yyyy_mm_dd(cell_text(cell(PURCHASE_DATE_HEADER)))
@@ -143,6 +147,7 @@ def __parse_row(
 
 def __parse_block(
     sheet_pd: pd.DataFrame,
+    index: BlockIndex,
     label_row_index: int,
     section_types: t.Tuple[SectionType, SectionType],
     time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
@@ -151,11 +156,7 @@ def __parse_block(
     A block runs from its header row up to the first row that no longer carries a
     scheme name, which is either the blank separator row or the next block's label
     """
-    header_row_index = None
-    for row_index in range(label_row_index + 1, len(sheet_pd)):
-        if optional_cell_text(sheet_pd.iloc[row_index].iloc[0]) == NAME_HEADER:
-            header_row_index = row_index
-            break
+    header_row_index = index.header_row_after(label_row_index)
     assert header_row_index is not None, (
         f"Block {sheet_pd.iloc[label_row_index].iloc[0]} has no header row starting"
         f" with {NAME_HEADER}"
@@ -171,11 +172,9 @@ def __parse_block(
     )
 
     sales: t.List[AssetSale] = []
-    for row_index in range(header_row_index + 1, len(sheet_pd)):
-        data = sheet_pd.iloc[row_index]
-        name = optional_cell_text(data.iloc[0])
-        if name == "" or name in CATEGORY_SECTION_TYPES:
-            break
+    for data in sheet_pd.iloc[
+        header_row_index + 1 : index.block_end_after(header_row_index)
+    ].itertuples(index=False, name=None):
         parsed_sale = __parse_row(data, column_map, section_types)
         if not date_utils.is_in_bounds(
             parsed_sale.sale_transaction.date["time_in_millis"], time_bounds_in_ms
@@ -186,21 +185,25 @@ def __parse_block(
 
 
 def parse_sheet(
-    xl: pd.ExcelFile,
+    xl: ReportReader,
     sheet_name: str,
     time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
 ) -> t.List[AssetSale]:
     logger.debug_log(f"Currently parsing {sheet_name} sheet")
     sheet_pd = xl.parse(sheet_name=sheet_name, header=None)
 
+    index = block_index.build(sheet_pd, CATEGORY_SECTION_TYPES, NAME_HEADER)
+
     sales: t.List[AssetSale] = []
-    for row_index in range(len(sheet_pd)):
-        label = optional_cell_text(sheet_pd.iloc[row_index].iloc[0])
-        section_types = CATEGORY_SECTION_TYPES.get(label)
-        if section_types is None:
-            continue
+    for row_index, label in index.labels:
         sales.extend(
-            __parse_block(sheet_pd, row_index, section_types, time_bounds_in_ms)
+            __parse_block(
+                sheet_pd,
+                index,
+                row_index,
+                CATEGORY_SECTION_TYPES[label],
+                time_bounds_in_ms,
+            )
         )
     return sales
 
@@ -211,7 +214,7 @@ def parse(
 ) -> SectionDataMap:
     logger.DEBUG = DEBUG
     sales: t.List[AssetSale] = []
-    with pd.ExcelFile(input_file_abs_path, engine="openpyxl") as xl:
+    with open_report(input_file_abs_path) as xl:
         workbook_sheet_names = assert_sheet_names(xl)
         logger.log(f"Total sheets present {workbook_sheet_names}")
         for sheet_name in workbook_sheet_names:
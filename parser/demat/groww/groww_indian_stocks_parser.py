@@ -5,6 +5,8 @@ from utils.excel_utils import (
     optional_cell_text,
     assert_sheet_names,
     to_float,
+    ReportReader,
+    open_report,
 )
 from models.transaction import Transaction, Price
 from models.asset_sale import (
@@ -13,6 +15,8 @@ from models.asset_sale import (
 )
 from models.section_type import SectionType
 from models.section_data import SectionDataMap
+from parser.demat.groww import block_index
+from parser.demat.groww.block_index import BlockIndex
 from parser.demat.groww.constants import NON_EQUITY_LINKED_SHARES
 
 warn_missing_module("pandas")
@@ -87,25 +91,20 @@ def __build_column_map(header: pd.Series) -> t.Dict[str, int]:
     return column_map
 
 
-def __parse_charges(sheet_pd: pd.DataFrame) -> t.Optional[float]:
+def __parse_charges(sheet_pd: pd.DataFrame, index: BlockIndex) -> t.Optional[float]:
     """
     Deductible charges of the whole statement, being its stated total less the
     securities transaction tax. None when the sheet carries no charges block
     """
-    label_row_index = None
-    for row_index in range(len(sheet_pd)):
-        if optional_cell_text(sheet_pd.iloc[row_index].iloc[0]) == CHARGES_BLOCK_LABEL:
-            label_row_index = row_index
-            break
+    label_row_index = index.first_label_row(CHARGES_BLOCK_LABEL)
     if label_row_index is None:
         return None
 
     charges: t.Dict[str, float] = {}
-    for row_index in range(label_row_index + 1, len(sheet_pd)):
-        label = optional_cell_text(sheet_pd.iloc[row_index].iloc[0])
-        if label == "":
-            break
-        charges[label] = to_float(sheet_pd.iloc[row_index].iloc[1])
+    for label, amount in sheet_pd.iloc[
+        label_row_index + 1 : index.block_end_after(label_row_index), :2
+    ].itertuples(index=False, name=None):
+        charges[optional_cell_text(label)] = to_float(amount)
 
     missing_labels = [
         label
@@ -149,12 +148,12 @@ def __apply_charges(sales: t.List[AssetSale], deductible_charges: float) -> None
 
 
 def __parse_row(
-    data: pd.Series,
+    data: t.Tuple[t.Any, ...],
     column_map: t.Dict[str, int],
     section_types: t.Tuple[SectionType, SectionType],
 ) -> AssetSale:
     def cell(header: str) -> t.Any:
-        return data.iloc[column_map[header]]
+        return data[column_map[header]]
 
     quantity = to_float(cell(QUANTITY_HEADER))
     name = cell_text(cell(NAME_HEADER))
@@ -193,6 +192,7 @@ def __parse_row(
 
 def __parse_block(
     sheet_pd: pd.DataFrame,
+    index: BlockIndex,
     label_row_index: int,
     section_types: t.Tuple[SectionType, SectionType],
     time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
@@ -201,11 +201,7 @@ def __parse_block(
     A block runs from its header row up to the first row that no longer carries a
     stock name, which is either the blank separator row or the next block's label
     """
-    header_row_index = None
-    for row_index in range(label_row_index + 1, len(sheet_pd)):
-        if optional_cell_text(sheet_pd.iloc[row_index].iloc[0]) == NAME_HEADER:
-            header_row_index = row_index
-            break
+    header_row_index = index.header_row_after(label_row_index)
     assert header_row_index is not None, (
         f"Block {sheet_pd.iloc[label_row_index].iloc[0]} has no header row starting"
         f" with {NAME_HEADER}"
@@ -221,11 +217,9 @@ def __parse_block(
     )
 
     sales: t.List[AssetSale] = []
-    for row_index in range(header_row_index + 1, len(sheet_pd)):
-        data = sheet_pd.iloc[row_index]
-        name = optional_cell_text(data.iloc[0])
-        if name == "" or name in BLOCK_LABELS:
-            break
+    for data in sheet_pd.iloc[
+        header_row_index + 1 : index.block_end_after(header_row_index)
+    ].itertuples(index=False, name=None):
         parsed_sale = __parse_row(data, column_map, section_types)
         if not date_utils.is_in_bounds(
             parsed_sale.sale_transaction.date["time_in_millis"], time_bounds_in_ms
@@ -236,23 +230,26 @@ def __parse_block(
 
 
 def parse_sheet(
-    xl: pd.ExcelFile,
+    xl: ReportReader,
     sheet_name: str,
     time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
 ) -> t.Tuple[t.List[AssetSale], t.Optional[float]]:
     logger.debug_log(f"Currently parsing {sheet_name} sheet")
     sheet_pd = xl.parse(sheet_name=sheet_name, header=None)
 
+    index = block_index.build(
+        sheet_pd, BLOCK_LABELS + (CHARGES_BLOCK_LABEL,), NAME_HEADER
+    )
+
     sales: t.List[AssetSale] = []
-    for row_index in range(len(sheet_pd)):
-        label = optional_cell_text(sheet_pd.iloc[row_index].iloc[0])
+    for row_index, label in index.labels:
         section_types = BLOCK_SECTION_TYPES.get(label)
         if section_types is None:
             continue
         sales.extend(
-            __parse_block(sheet_pd, row_index, section_types, time_bounds_in_ms)
+            __parse_block(sheet_pd, index, row_index, section_types, time_bounds_in_ms)
         )
-    return sales, __parse_charges(sheet_pd)
+    return sales, __parse_charges(sheet_pd, index)
 
 
 def parse(
@@ -262,7 +259,7 @@ def parse(
     logger.DEBUG = DEBUG
     sales: t.List[AssetSale] = []
     deductible_charges: t.Optional[float] = None
-    with pd.ExcelFile(input_file_abs_path, engine="openpyxl") as xl:
+    with open_report(input_file_abs_path) as xl:
         workbook_sheet_names = assert_sheet_names(xl)
         logger.log(f"Total sheets present {workbook_sheet_names}")
         for sheet_name in workbook_sheet_names:
@@ -5,9 +5,12 @@ from utils import logger, date_utils
 from utils.excel_utils import (
     EMPTY_CELL_MARKER,
     cell_text,
+    cell_texts,
     optional_cell_text,
     assert_sheet_names,
     to_float,
+    ReportReader,
+    open_report,
 )
 from utils.rates import rbi_rates_utils
 from models.transaction import Transaction, Price
@@ -20,8 +23,11 @@ from models.section_data import SectionDataMap
 from models.itr.faa3 import FAA3
 from models.org import Organization
 
+warn_missing_module("numpy")
 warn_missing_module("pandas")
 warn_missing_module("openpyxl")
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 import typing as t
 
@@ -121,14 +127,36 @@ def __parse_date(value: t.Any) -> date_utils.DateObj:
     return date_utils.parse_yyyy_mm_dd(pd.Timestamp(value).strftime("%Y-%m-%d"))
 
 
-def __find_header_row(sheet_pd: pd.DataFrame) -> t.Optional[int]:
-    for row_index in range(len(sheet_pd)):
-        row_values = {
-            str(value).strip() for value in sheet_pd.iloc[row_index] if pd.notna(value)
-        }
-        if NAME_HEADER in row_values and EXCHANGE_RATE_HEADER in row_values:
-            return row_index
-    return None
+def __find_header_row(
+    texts: pd.DataFrame, headers: t.Tuple[str, ...]
+) -> t.Optional[int]:
+    """
+    Position of the first row carrying every one of the headers, whichever columns
+    they are in
+    """
+    is_header_row = np.ones(len(texts), dtype=bool)
+    for header in headers:
+        is_header_row &= (texts == header).any(axis=1).to_numpy()
+    header_row_indices = np.flatnonzero(is_header_row)
+    if len(header_row_indices) == 0:
+        return None
+    return int(header_row_indices[0])
+
+
+def __block_end(is_end: npt.NDArray[np.bool_]) -> int:
+    """
+    Number of rows of a block running until the first row marked as its end
+    """
+    end_indices = np.flatnonzero(is_end)
+    return int(end_indices[0]) if len(end_indices) else len(is_end)
+
+
+def __column_values(
+    rows_pd: pd.DataFrame, column_index: t.Optional[int]
+) -> t.List[t.Any]:
+    if column_index is None:
+        return [None] * len(rows_pd)
+    return rows_pd.iloc[:, column_index].tolist()
 
 
 def __build_column_map(
@@ -160,13 +188,6 @@ def __build_column_map(
     return column_map
 
 
-def __is_data_row(name_value: t.Any) -> bool:
-    if not isinstance(name_value, str):
-        return False
-    name = name_value.strip()
-    return name not in ("", GAINS_MARKER, LOSSES_MARKER, EMPTY_CELL_MARKER)
-
-
 def __column_index(
     column_map: t.Dict[str, int], key: t.Tuple[str, ...]
 ) -> t.Optional[int]:
@@ -197,13 +218,10 @@ def __section_type(sheet_name: str) -> SectionType:
 
 
 def __parse_row(
-    data: pd.Series, column_map: t.Dict[str, int], section_type: SectionType
+    data: t.Dict[t.Tuple[str, ...], t.Any], section_type: SectionType
 ) -> AssetSale:
     def cell(key: t.Tuple[str, ...]) -> t.Any:
-        column_index = __column_index(column_map, key)
-        if column_index is None:
-            return None
-        return data.iloc[column_index]
+        return data[key]
 
     sale_date = __parse_date(cell(SALE_DATE_KEY))
     purchase_date = __parse_date(cell(PURCHASE_DATE_KEY))
@@ -252,14 +270,15 @@ def __parse_row(
 
 
 def parse_sheet(
-    xl: pd.ExcelFile,
+    xl: ReportReader,
     sheet_name: str,
     time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
 ) -> t.List[AssetSale]:
     logger.debug_log(f"Currently parsing {sheet_name} sheet")
     sheet_pd = xl.parse(sheet_name=sheet_name, header=None)
+    texts = cell_texts(sheet_pd)
 
-    header_row_index = __find_header_row(sheet_pd)
+    header_row_index = __find_header_row(texts, (NAME_HEADER, EXCHANGE_RATE_HEADER))
     if header_row_index is None:
         logger.log(f"Sheet {sheet_name} has no US stocks table, skipping it")
         return []
@@ -278,15 +297,32 @@ def parse_sheet(
     name_column = __column_index(column_map, NAME_KEY)
     assert name_column is not None
     section_type = __section_type(sheet_name)
+
+    # the trades run from below the two header rows down to the total, split by
+    # the gains and losses markers and the dashes closing each of them
+    first_row_index = header_row_index + 2
+    is_name_text = (
+        sheet_pd.iloc[first_row_index:, name_column]
+        .map(lambda value: isinstance(value, str))
+        .to_numpy(dtype=bool)
+    )
+    name_texts = texts.iloc[first_row_index:, name_column]
+    row_count = __block_end(is_name_text & (name_texts == TOTAL_MARKER).to_numpy())
+    is_data_row = (
+        is_name_text
+        & ~name_texts.isin(
+            ("", GAINS_MARKER, LOSSES_MARKER, EMPTY_CELL_MARKER)
+        ).to_numpy()
+    )[:row_count]
+    rows_pd = sheet_pd.iloc[first_row_index : first_row_index + row_count][is_data_row]
+
+    columns = {
+        key: __column_values(rows_pd, __column_index(column_map, key))
+        for key in REQUIRED_KEYS + (BROKER_KEY,)
+    }
     sales: t.List[AssetSale] = []
-    for row_index in range(header_row_index + 2, len(sheet_pd)):
-        data = sheet_pd.iloc[row_index]
-        name_value = data.iloc[name_column]
-        if isinstance(name_value, str) and name_value.strip() == TOTAL_MARKER:
-            break
-        if not __is_data_row(name_value):
-            continue
-        parsed_sale = __parse_row(data, column_map, section_type)
+    for values in zip(*columns.values()):
+        parsed_sale = __parse_row(dict(zip(columns, values)), section_type)
         if not date_utils.is_in_bounds(
             parsed_sale.sale_transaction.date["time_in_millis"], time_bounds_in_ms
         ):
@@ -295,7 +331,7 @@ def parse_sheet(
     return sales
 
 
-def __parse_fa_sheet(xl: pd.ExcelFile, sheet_name: str) -> t.List[FAA3]:
+def __parse_fa_sheet(xl: ReportReader, sheet_name: str) -> t.List[FAA3]:
     """
     Section A3 of the schedule FA sheet, whose header row is the one carrying the
     entity name. The rows above it hold section A2, the foreign custodial accounts,
@@ -303,21 +339,19 @@ def __parse_fa_sheet(xl: pd.ExcelFile, sheet_name: str) -> t.List[FAA3]:
     """
     logger.debug_log(f"Currently parsing {sheet_name} sheet")
     sheet_pd = xl.parse(sheet_name=sheet_name, header=None)
+    texts = cell_texts(sheet_pd)
 
-    header_row_index = None
-    for row_index in range(len(sheet_pd)):
-        row = {
-            optional_cell_text(value): index
-            for index, value in enumerate(sheet_pd.iloc[row_index])
-        }
-        if FA_ENTITY_NAME_HEADER in row and FA_ACQUIRED_DATE_HEADER in row:
-            header_row_index = row_index
-            column_map = row
-            break
+    header_row_index = __find_header_row(
+        texts, (FA_ENTITY_NAME_HEADER, FA_ACQUIRED_DATE_HEADER)
+    )
     assert header_row_index is not None, (
         f"{sheet_name} sheet has no section A3 header row carrying"
         f" {FA_ENTITY_NAME_HEADER} and {FA_ACQUIRED_DATE_HEADER}"
     )
+    column_map = {
+        optional_cell_text(value): index
+        for index, value in enumerate(sheet_pd.iloc[header_row_index])
+    }
 
     missing_headers = [
         header for header in FA_REQUIRED_HEADERS if header not in column_map
@@ -327,15 +361,26 @@ def __parse_fa_sheet(xl: pd.ExcelFile, sheet_name: str) -> t.List[FAA3]:
         f" {missing_headers}. Found columns = {sorted(column_map)}"
     )
 
+    # the holdings run until the first row without an entity name
+    first_row_index = header_row_index + 1
+    row_count = __block_end(
+        (
+            texts.iloc[first_row_index:, column_map[FA_ENTITY_NAME_HEADER]] == ""
+        ).to_numpy()
+    )
+    rows_pd = sheet_pd.iloc[first_row_index : first_row_index + row_count]
+    columns = {
+        header: __column_values(rows_pd, column_map[header])
+        for header in FA_REQUIRED_HEADERS
+    }
+
     entries: t.List[FAA3] = []
-    for row_index in range(header_row_index + 1, len(sheet_pd)):
-        data = sheet_pd.iloc[row_index]
+    for values in zip(*columns.values()):
+        data = dict(zip(columns, values))
 
         def cell(header: str) -> t.Any:
-            return data.iloc[column_map[header]]
+            return data[header]
 
-        if optional_cell_text(cell(FA_ENTITY_NAME_HEADER)) == "":
-            break
         entries.append(
             FAA3(
                 org=Organization(
@@ -367,7 +412,7 @@ def parse(
     logger.DEBUG = DEBUG
     sales: t.List[AssetSale] = []
     fa_entries: t.List[FAA3] = []
-    with pd.ExcelFile(input_file_abs_path, engine="openpyxl") as xl:
+    with open_report(input_file_abs_path) as xl:
         workbook_sheet_names = assert_sheet_names(xl)
         logger.log(f"Total sheets present {workbook_sheet_names}")
         # dict keys keep the short term before long term ordering while dropping a
@@ -380,16 +425,23 @@ def parse(
                 if pattern.search(sheet_name)
             )
         )
-        assert parsable_sheet_names, (
+        fa_sheet_names = [
+            sheet_name
+            for sheet_name in workbook_sheet_names
+            if FA_SHEET_NAME_PATTERN.search(sheet_name)
+        ]
+        # a sheet exported as CSV is an input of its own, so the schedule FA sheet
+        # may well come without any capital gain sheet beside it
+        assert parsable_sheet_names or fa_sheet_names, (
             "Excel sheet don't have any sheet matching "
             + f"{[pattern.pattern for pattern in SUPPORTED_SHEET_NAME_PATTERNS]}"
+            + f" or {FA_SHEET_NAME_PATTERN.pattern}"
         )
         for sheet_name in parsable_sheet_names:
             sales.extend(parse_sheet(xl, sheet_name, time_bounds_in_ms))
 
-        for sheet_name in workbook_sheet_names:
-            if FA_SHEET_NAME_PATTERN.search(sheet_name):
-                fa_entries.extend(__parse_fa_sheet(xl, sheet_name))
+        for sheet_name in fa_sheet_names:
+            fa_entries.extend(__parse_fa_sheet(xl, sheet_name))
 
     sales.sort(key=lambda sale: sale.sale_transaction.date["time_in_millis"])
 
@@ -99,17 +99,19 @@ def parse_org_purchases(
             )
         )
 
-    for purchase in after_purchases:
+    # every lot is held up to the same end of the period, so their peaks come out of
+    # one pass over the price history
+    peak_prices_in_inr = share_data_utils.get_peak_prices_in_inr(
+        ticker,
+        [purchase.purchase.date["time_in_millis"] for purchase in after_purchases],
+        end_time_in_ms,
+    )
+    for purchase, peak_price_in_inr in zip(after_purchases, peak_prices_in_inr):
         fa_entries.append(
             FAA3(
                 org,
                 purchase_date=purchase.purchase.date,
-                peak_price=purchase.purchase.quantity
-                * share_data_utils.get_peak_price_in_inr(
-                    ticker,
-                    purchase.purchase.date["time_in_millis"],
-                    end_time_in_ms,
-                ),
+                peak_price=purchase.purchase.quantity * peak_price_in_inr,
                 purchase_price=purchase.purchase.quantity
                 * purchase.purchase.fmv.price
                 * rbi_rates_utils.get_rate_for_prev_mon_for_time_in_ms(
@@ -5,46 +5,202 @@ The ITR parser (utils/share_data_utils.py) reads a single-header CSV with a
 "Date" column in %Y-%m-%d format and a "Close" column. yfinance returns a
 MultiIndex column frame whose default to_csv output has extra header rows, so
 this script flattens the columns and reformats the date before writing.
+
+A stored history is extended rather than downloaded again: the day before the
+last stored one is fetched once more to check the history still matches, and
+only the days after it are written again. The last stored day is among them, as
+it may hold the partial close of a session still trading when it was fetched. A
+mismatch (e.g. after a split) or `--full` downloads the full history. Every refresh is recorded in the refresh manifest, which is
+what lets run.py skip a ticker that cannot have anything new.
 """
 
 import argparse
 import os
 import sys
 from datetime import date, timedelta
+import typing as t
 
+from utils import cache_utils, refresh_client, refresh_manifest
 from utils.runtime_utils import warn_missing_module
 
+if t.TYPE_CHECKING:
+    # pandas comes with yfinance, so like it it is only imported once a refresh runs
+    import pandas as pd
+
 script_path = os.path.realpath(os.path.dirname(__file__))
+SHARES_FOLDER = os.path.join(script_path, "historic_data", "shares")
 DEFAULT_TICKER = "adbe"
 DEFAULT_START = "1986-08-13"
+# yfinance rounds to cents, so a stored close matches a fetched one well within this
+OVERLAP_CLOSE_TOLERANCE = 1e-6
+
+
+def data_path(ticker: str) -> str:
+    return os.path.join(SHARES_FOLDER, ticker.lower(), "data.csv")
 
 
-def refresh(ticker: str, start: str, end: str) -> str:
+def __download(ticker: str, start: str, end: str, deadline: float) -> "pd.DataFrame":
     # Imported lazily so importing this module (e.g. from run.py) does not
     # require yfinance to be installed unless a refresh is actually requested.
     warn_missing_module("yfinance")
     # pylint: disable-next=import-outside-toplevel
     import yfinance as yf
 
-    df = yf.download(
-        ticker.upper(), start=start, end=end, auto_adjust=False, rounding=True
-    )
-    if df.empty:
-        raise SystemExit(f"No data returned from yfinance for ticker {ticker}")
+    def attempt() -> "pd.DataFrame":
+        df = yf.download(
+            ticker.upper(), start=start, end=end, auto_adjust=False, rounding=True
+        )
+        # yfinance logs a failed download and hands back an empty frame instead of
+        # raising, which is also all a transient failure leaves to go by
+        if df is None or df.empty:
+            raise refresh_client.TransientError(
+                f"No data returned from yfinance for ticker {ticker}"
+            )
+        return t.cast("pd.DataFrame", df)
+
+    try:
+        df = refresh_client.call_with_retries(
+            f"share prices for {ticker.lower()}", attempt, deadline
+        )
+    except refresh_client.TransientError as err:
+        raise SystemExit(str(err)) from err
 
     # yfinance returns MultiIndex columns (field, ticker); drop the ticker level.
     if df.columns.nlevels > 1:
-        df.columns = df.columns.droplevel(1)
+        df.columns = df.columns.get_level_values(0)
 
     df = df.reset_index()
     df["Date"] = df["Date"].dt.strftime("%Y-%m-%d")
+    return df
 
-    out_path = os.path.join(
-        script_path, "historic_data", "shares", ticker.lower(), "data.csv"
-    )
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    df.to_csv(out_path, index=False)
+
+def __read_stored(out_path: str) -> t.Optional["pd.DataFrame"]:
+    if not os.path.exists(out_path):
+        return None
+    # pylint: disable-next=import-outside-toplevel
+    import pandas as pd
+
+    try:
+        stored_df = pd.read_csv(out_path)
+    except (OSError, ValueError) as err:
+        print(f"Could not read {out_path} ({err}), downloading the full history")
+        return None
+    if stored_df.empty or not {"Date", "Close"}.issubset(stored_df.columns):
+        return None
+    return stored_df
+
+
+def __write_full(
+    ticker: str, out_path: str, start: str, end: str, deadline: float
+) -> str:
+    """
+    Downloads and writes the full history, returning the last day it covers
+    """
+    df = __download(ticker, start, end, deadline)
+    cache_utils.write_atomically(out_path, df.to_csv(index=False).encode("utf-8"))
     print(f"Wrote {len(df)} rows for {ticker.lower()} to {out_path}")
+    return str(df["Date"].iloc[-1])
+
+
+def __matches_stored(
+    ticker: str, tail_df: "pd.DataFrame", stored_df: "pd.DataFrame", overlap_date: str
+) -> bool:
+    """
+    Whether the rows fetched again line up with the stored ones, in their columns
+    and in the close of the day both hold
+    """
+    if list(tail_df.columns) != list(stored_df.columns):
+        print(
+            f"Columns fetched for {ticker.lower()} {list(tail_df.columns)} differ from "
+            f"the stored {list(stored_df.columns)}"
+        )
+        return False
+    overlap_df = tail_df[tail_df["Date"] == overlap_date]
+    stored_close = float(stored_df["Close"][stored_df["Date"] == overlap_date].iloc[0])
+    if overlap_df.empty or (
+        abs(float(overlap_df["Close"].iloc[0]) - stored_close) > OVERLAP_CLOSE_TOLERANCE
+    ):
+        print(
+            f"Close of {ticker.lower()} on {overlap_date} fetched again does not "
+            "match the stored one"
+        )
+        return False
+    return True
+
+
+def __append_tail(
+    ticker: str, out_path: str, stored_df: "pd.DataFrame", end: str, deadline: float
+) -> t.Optional[str]:
+    """
+    Fetches from the last but one stored day on and writes the days after it over
+    the stored ones, returning the last day the history then covers. The last
+    stored day is fetched again as a refresh during its session stored a partial
+    close, and the day before it is checked to still be the one Yahoo serves, which
+    a split rewrites; None when it does not match or there is no day before,
+    leaving it to the caller to download the full history instead
+    """
+    last_date = str(stored_df["Date"].iloc[-1])
+    if last_date >= end:
+        print(f"{ticker.lower()} is already up to date till {last_date}")
+        return last_date
+    if len(stored_df) < 2:
+        return None
+
+    overlap_date = str(stored_df["Date"].iloc[-2])
+    tail_df = __download(ticker, overlap_date, end, deadline)
+    if not __matches_stored(ticker, tail_df, stored_df, overlap_date):
+        return None
+
+    new_df = tail_df[tail_df["Date"] > overlap_date]
+    if new_df.empty:
+        print(f"No rows for {ticker.lower()} after {overlap_date}, keeping {last_date}")
+        return last_date
+
+    with open(out_path, "rb") as file:
+        stored_bytes = file.read()
+    # the stored rows before the last one are kept byte for byte, so only the rows
+    # fetched after the overlap are serialised
+    kept_bytes = stored_bytes.rstrip(b"\r\n").rpartition(b"\n")[0] + b"\n"
+    refreshed_bytes = kept_bytes + new_df.to_csv(index=False, header=False).encode(
+        "utf-8"
+    )
+    new_last_date = str(new_df["Date"].iloc[-1])
+    if refreshed_bytes == stored_bytes:
+        print(f"No new rows for {ticker.lower()} after {last_date}")
+        return new_last_date
+    cache_utils.write_atomically(out_path, refreshed_bytes)
+    print(
+        f"Wrote {len(new_df)} rows for {ticker.lower()} after {overlap_date} to "
+        f"{out_path}"
+    )
+    return new_last_date
+
+
+def refresh(
+    ticker: str,
+    start: str,
+    end: str,
+    full: bool = False,
+    deadline_in_s: float = refresh_client.DEFAULT_DEADLINE_IN_S,
+) -> str:
+    """
+    Brings the stored history of the ticker up to `end`. A stored history is only
+    extended by the days after its last one, `start` bounding a full download,
+    which is what a missing or mismatching history or `full` falls back to. The
+    refresh is recorded in the refresh manifest. Transient failures are retried
+    until `deadline_in_s` from now
+    """
+    deadline = refresh_client.deadline_in(deadline_in_s)
+    out_path = data_path(ticker)
+    stored_df = None if full else __read_stored(out_path)
+    last_date = None
+    if stored_df is not None:
+        last_date = __append_tail(ticker, out_path, stored_df, end, deadline)
+        if last_date is None:
+            print(f"Downloading the full history of {ticker.lower()} again")
+    if last_date is None:
+        last_date = __write_full(ticker, out_path, start, end, deadline)
+    refresh_manifest.record(refresh_manifest.SHARES_SOURCE, ticker, last_date)
     return out_path
 
 
@@ -73,8 +229,24 @@ def main() -> None:
         dest="end",
         help="End date (YYYY-MM-DD, exclusive), default = tomorrow",
     )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        dest="full",
+        default=False,
+        help="Download the full history instead of only the days after the last "
+        "stored one",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=refresh_client.DEFAULT_DEADLINE_IN_S,
+        dest="deadline",
+        help="Seconds the download, retries included, may take, default = "
+        f"{refresh_client.DEFAULT_DEADLINE_IN_S}",
+    )
     args = parser.parse_args()
-    refresh(args.ticker, args.start, args.end)
+    refresh(args.ticker, args.start, args.end, args.full, args.deadline)
 
 
 if __name__ == "__main__":
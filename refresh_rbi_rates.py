@@ -12,15 +12,24 @@ data is only available from that date. The rates are fetched from the public
 Frankfurter API (https://frankfurter.dev), which exposes the FBIL benchmark via
 `providers=FBIL`. Only the currency pairs that are refreshed are replaced; any
 other pairs already in the file (and older RBI-era data) are left untouched.
+
+A pair already in the file is only fetched from the last month it holds on,
+that month's rate moving until the month is over, and those months replace its
+rows from then on. `--full` fetches every month from the start date again.
+
+Every write of the workbook also compiles it into `RATES_CACHE_FILE_NAME` beside
+it, which is what a run reads the rates from while it still matches the workbook.
 """
 
 import argparse
+import io
 import os
 import sys
 from datetime import date, datetime
 import typing as t
 from collections.abc import Sequence
 
+from utils import cache_utils, refresh_client, refresh_manifest
 from utils.rates.constants import RATES_FILE_ABS_PATH, RATES_SHEET_NAME
 from utils.runtime_utils import warn_missing_module
 
@@ -37,15 +46,11 @@ QUOTE_CURRENCY = "INR"
 
 
 def __fetch_month_end_rates(
-    currency: str, start: str, end: str
+    currency: str, start: str, end: str, deadline: float
 ) -> Sequence[tuple[datetime, float]]:
     """Return an ordered list of (datetime, rate) for the last FBIL business day
     of each month in [start, end), as INR per 1 unit of `currency`."""
-    warn_missing_module("requests")
-    # pylint: disable-next=import-outside-toplevel
-    import requests
-
-    resp = requests.get(
+    resp = refresh_client.get(
         FRANKFURTER_URL,
         params={
             "from": start,
@@ -54,7 +59,7 @@ def __fetch_month_end_rates(
             "quotes": QUOTE_CURRENCY,
             "providers": "FBIL",
         },
-        timeout=60,
+        deadline=deadline,
     )
     resp.raise_for_status()
     payload = resp.json()
@@ -82,7 +87,10 @@ def __read_existing(rates_path: str) -> Sequence[t.List[t.Any]]:
     # pylint: disable-next=import-outside-toplevel
     import pandas as pd
 
-    with pd.ExcelFile(rates_path, engine="openpyxl") as xl:
+    # pylint: disable-next=import-outside-toplevel
+    from utils.excel_utils import WorkbookReader
+
+    with WorkbookReader(rates_path) as xl:
         df = xl.parse(sheet_name=RATES_SHEET_NAME, skiprows=0, header=2)
     df = df.reindex(columns=COLUMNS)
     return [
@@ -106,36 +114,111 @@ def __write(rates_path: str, rows: Sequence[list[t.Any]]) -> None:
         for row in rows:
             ws.append(row)
 
-        wb.save(rates_path)
+        # the run parses while the refresh goes on, so the workbook is replaced
+        # whole rather than saved over in place
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        cache_utils.write_atomically(rates_path, buffer.getvalue())
     else:
         raise ValueError(
             "active workbook returned None when writing the refreshed rates"
         )
 
 
+def __record_refresh(currencies: list[str], rows: Sequence[list[t.Any]]) -> None:
+    """
+    Records every refreshed currency in the refresh manifest up to the last day
+    the workbook holds a rate of it for
+    """
+    for cur in currencies:
+        pair = f"INR / 1 {cur.upper()}"
+        rate_dates = [
+            datetime.strptime(str(row[0]), DATE_FMT) for row in rows if row[2] == pair
+        ]
+        if rate_dates:
+            refresh_manifest.record(
+                refresh_manifest.RATES_SOURCE,
+                cur,
+                max(rate_dates).strftime("%Y-%m-%d"),
+            )
+
+
+def __row_date(row: Sequence[t.Any]) -> datetime:
+    return datetime.strptime(str(row[0]), DATE_FMT)
+
+
+def __fetch_start(pair_rows: Sequence[list[t.Any]], start: str) -> str:
+    """
+    The first day of the last month the pair already holds a rate for, or `start`
+    when it holds none. That month is fetched again as its month end rate moves
+    until the month is over
+    """
+    if not pair_rows:
+        return start
+    last_month_start = max(__row_date(row) for row in pair_rows).replace(day=1)
+    return max(start, last_month_start.strftime("%Y-%m-%d"))
+
+
 def refresh(
-    currencies: list[str], start: str, end: str, rates_path: str = RATES_FILE_ABS_PATH
+    currencies: list[str],
+    start: str,
+    end: str,
+    rates_path: str = RATES_FILE_ABS_PATH,
+    full: bool = False,
+    deadline_in_s: float = refresh_client.DEFAULT_DEADLINE_IN_S,
 ) -> str:
+    """
+    Refreshes the pairs of the currencies, fetching only the months from the last
+    one each pair already holds on, or everything from `start` when `full`. Every
+    currency is fetched over the same connections, retrying transient failures
+    until `deadline_in_s` from now
+    """
+    deadline = refresh_client.deadline_in(deadline_in_s)
     refreshed_pairs = {f"INR / 1 {cur.upper()}" for cur in currencies}
     existing_rows = __read_existing(rates_path)
     # Keep every existing row whose pair we are NOT refreshing.
     rows = [row for row in existing_rows if row[2] not in refreshed_pairs]
 
     added = 0
+    changed = False
     for cur in currencies:
         pair = f"INR / 1 {cur.upper()}"
-        for entry_date, rate in __fetch_month_end_rates(cur, start, end):
-            rows.append([entry_date.strftime(DATE_FMT), RATE_TIME, pair, rate, None])
-            added += 1
+        pair_rows = [row for row in existing_rows if row[2] == pair]
+        fetch_start = start if full else __fetch_start(pair_rows, start)
+        # rows before the fetched months are kept as they are, so only the months
+        # from the last one held on are transferred
+        kept_rows = (
+            []
+            if full
+            else [
+                row
+                for row in pair_rows
+                if __row_date(row) < datetime.strptime(fetch_start, "%Y-%m-%d")
+            ]
+        )
+        fetched_rows = (
+            [
+                [entry_date.strftime(DATE_FMT), RATE_TIME, pair, rate, None]
+                for entry_date, rate in __fetch_month_end_rates(
+                    cur, fetch_start, end, deadline
+                )
+            ]
+            if fetch_start <= end
+            else []
+        )
+        changed = changed or kept_rows + fetched_rows != pair_rows
+        rows.extend(kept_rows + fetched_rows)
+        added += len(fetched_rows)
 
     # The workbook stamps its own creation time, so re-saving an unchanged sheet
     # still rewrites the file. Nothing published since the last refresh means
     # nothing to write
-    if rows == existing_rows:
+    if not changed:
         print(
             f"{rates_path} already holds every rate published up to {end}, "
             "leaving it untouched"
         )
+        __record_refresh(currencies, rows)
         return rates_path
 
     os.makedirs(os.path.dirname(rates_path), exist_ok=True)
@@ -144,6 +227,12 @@ def refresh(
         f"Wrote {len(rows)} rows to {rates_path} "
         f"({added} refreshed for {sorted(refreshed_pairs)})"
     )
+    # the cache is what a run reads the rates from, so it follows the workbook
+    # pylint: disable-next=import-outside-toplevel
+    from utils.rates import rbi_rates_utils
+
+    print(f"Wrote the rates cache to {rbi_rates_utils.refresh_cache(rates_path)}")
+    __record_refresh(currencies, rows)
     return rates_path
 
 
@@ -172,8 +261,30 @@ def main() -> None:
         dest="end",
         help="End date (YYYY-MM-DD, inclusive), default = today",
     )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        dest="full",
+        default=False,
+        help="Fetch every month from the start date instead of only the months "
+        "from the last one already held on",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=refresh_client.DEFAULT_DEADLINE_IN_S,
+        dest="deadline",
+        help="Seconds the fetches of every currency, retries included, may take, "
+        f"default = {refresh_client.DEFAULT_DEADLINE_IN_S}",
+    )
     args = parser.parse_args()
-    refresh(args.currencies or DEFAULT_CURRENCIES, args.start, args.end)
+    refresh(
+        args.currencies or DEFAULT_CURRENCIES,
+        args.start,
+        args.end,
+        full=args.full,
+        deadline_in_s=args.deadline,
+    )
 
 
 if __name__ == "__main__":
@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 import argparse
+import functools
+import multiprocessing
 import os
 import sys
+import threading
+import time
 import typing as t
 
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import date, timedelta
 
 from parser.demat.etrade import etrade_benefit_history_parser
@@ -12,8 +18,16 @@ from parser.demat.indmoney import indmoney_us_stocks_parser
 from parser.demat.groww import groww_indian_mf_parser, groww_indian_stocks_parser
 from parser.demat.sale_operation_parser import SaleOperationParser
 from models.section_data import SectionDataMap
+from models.transaction import TransactionWithTicker
 from aggregator import asset_aggregator
-from utils import logger, date_utils
+from utils import (
+    logger,
+    date_utils,
+    excel_utils,
+    parse_cache,
+    pending_refresh,
+    refresh_manifest,
+)
 from utils.ticker_mapping import ticker_currency_info, ticker_org_info
 from refresh_historic_data import refresh, DEFAULT_START
 import refresh_rbi_rates
@@ -37,16 +51,42 @@ SALE_OPERATION_PARSERS: t.Dict[str, t.Tuple[SaleOperationParser, ...]] = {
     GROWW_INDIAN_MF_OPERATION_MODE: (groww_indian_mf_parser,),
 }
 
+# Operation modes feeding schedule FA under section A3, to the step building the
+# entries out of the purchases read from the report
+SCHEDULE_FA_PURCHASES_PARSERS: t.Dict[
+    str,
+    t.Callable[
+        [t.List[TransactionWithTicker], str, str, date_utils.CalendarMode, int],
+        SectionDataMap,
+    ],
+] = {
+    ETRADE_BENEFIT_HISTORY_OPERATION_MODE: etrade_benefit_history_parser.parse_purchases,
+    ETRADE_HOLDINGS_BYSTATUS_OPERATION_MODE: etrade_holdings_bystatus_parser.parse_purchases,
+}
+
 OPERATION_MODES = [
-    ETRADE_BENEFIT_HISTORY_OPERATION_MODE,
-    ETRADE_HOLDINGS_BYSTATUS_OPERATION_MODE,
+    *SCHEDULE_FA_PURCHASES_PARSERS,
     *SALE_OPERATION_PARSERS,
 ]
 
+# Operation modes whose report is read with the help of share prices (RSU releases
+# are valued at the FMV of their day) or reference rates (US stock sales), so that
+# reading one in a worker process waits for the refresh to be over first
+REFRESHED_DATA_OPERATION_MODES = (
+    ETRADE_BENEFIT_HISTORY_OPERATION_MODE,
+    INDMONEY_US_STOCKS_OPERATION_MODE,
+)
+
 # an input is given as `<operation mode>:<file path>`, which is what lets one run read
 # a report per source instead of a single file of a single mode
 INPUT_SEPARATOR = ":"
 
+# the refresh of every ticker and of the rates waits on the network rather than the
+# interpreter, so they run on threads of their own, this many at once as a run may
+# hold many tickers, and the run goes on with the bundled data after the timeout
+REFRESH_MAX_WORKERS = 8
+REFRESH_TIMEOUT_IN_S = 120
+
 DEFAULT_CALENDER_MODE = "calendar"
 FINANCIAL_CALENDER_MODE = "financial"
 CALENDER_MODES = [
@@ -71,10 +111,214 @@ def __parse_inputs(inputs: t.List[str]) -> t.List[t.Tuple[str, str]]:
             f"Input {value} carries the unsupported operation mode {operation_mode}."
             f" Supported operation modes = {OPERATION_MODES}"
         )
+        # every parser reads a workbook or its CSV export alike, the reader being
+        # picked by the extension, so this only turns away what neither reads
+        extension = os.path.splitext(input_excel_file)[1].lower()
+        assert extension not in excel_utils.FAST_ENGINE_FILE_EXTENSIONS or (
+            excel_utils.preferred_engine() == excel_utils.FAST_ENGINE
+        ), (
+            f"Input {value} is a {extension} workbook, which is only read once"
+            f' {excel_utils.FAST_ENGINE_MODULE} is installed (pip3 install ".[fast]")'
+        )
+        assert extension in excel_utils.report_file_extensions(), (
+            f"Input {value} is a {extension or 'extensionless'} file."
+            f" Supported file extensions = {excel_utils.report_file_extensions()}"
+        )
         parsed_inputs.append((operation_mode, input_excel_file))
     return parsed_inputs
 
 
+@dataclass(frozen=True)
+class ReadInput:
+    """
+    What reading one input produced. A schedule FA mode hands back the purchases of
+    its report, None when it holds none of their sheets, the entries being built out
+    of them by `merge_read_inputs` as that also writes the raw workings
+    """
+
+    sections: SectionDataMap
+    purchases: t.Optional[t.List[TransactionWithTicker]]
+
+
+def __set_debug(debug: bool) -> None:
+    logger.DEBUG = debug
+    etrade_benefit_history_parser.DEBUG = debug
+    etrade_holdings_bystatus_parser.DEBUG = debug
+    for sale_operation_parsers in SALE_OPERATION_PARSERS.values():
+        for sale_operation_parser in sale_operation_parsers:
+            sale_operation_parser.DEBUG = debug
+    asset_aggregator.DEBUG = debug
+
+
+def __parse_sales(
+    operation_mode: str,
+    input_excel_file: str,
+    time_bounds_in_ms: date_utils.DateBoundsInMs,
+) -> SectionDataMap:
+    """
+    Sales read out of the report by every parser of the operation mode
+    """
+    sections: SectionDataMap = SectionDataMap()
+    for sale_operation_parser in SALE_OPERATION_PARSERS[operation_mode]:
+        for section_type, rows in sale_operation_parser.parse(
+            input_excel_file, time_bounds_in_ms=time_bounds_in_ms
+        ).items():
+            sections.setdefault(section_type, []).extend(rows)
+    return sections
+
+
+def __read_input(
+    operation_mode: str,
+    input_excel_file: str,
+    calendar_mode: date_utils.CalendarMode,
+    assessment_year: int,
+    parse_cache_folder: t.Optional[str],
+) -> ReadInput:
+    if operation_mode in SALE_OPERATION_PARSERS:
+        time_bounds_in_ms = date_utils.calendar_range(calendar_mode, assessment_year)
+        return ReadInput(
+            sections=parse_cache.get_or_parse(
+                parse_cache_folder,
+                operation_mode,
+                input_excel_file,
+                time_bounds_in_ms,
+                functools.partial(
+                    __parse_sales, operation_mode, input_excel_file, time_bounds_in_ms
+                ),
+            ),
+            purchases=None,
+        )
+
+    # only the purchases read out of a schedule FA report are kept, the entries
+    # being built from them on every run as that also writes the raw workings
+    if operation_mode == ETRADE_HOLDINGS_BYSTATUS_OPERATION_MODE:
+        purchases = parse_cache.get_or_parse(
+            parse_cache_folder,
+            operation_mode,
+            input_excel_file,
+            None,
+            functools.partial(
+                etrade_holdings_bystatus_parser.read_purchases, input_excel_file
+            ),
+        )
+    else:
+        benefit_time_bounds_in_ms: date_utils.DateBoundsInMs = (
+            None,
+            date_utils.calendar_range("calendar", assessment_year)[1],
+        )
+        purchases = parse_cache.get_or_parse(
+            parse_cache_folder,
+            operation_mode,
+            input_excel_file,
+            benefit_time_bounds_in_ms,
+            functools.partial(
+                etrade_benefit_history_parser.read_purchases,
+                input_excel_file,
+                benefit_time_bounds_in_ms,
+            ),
+        )
+    return ReadInput(sections=SectionDataMap(), purchases=purchases)
+
+
+def read_all_inputs(
+    inputs: t.List[t.Tuple[str, str]],
+    calendar_mode: date_utils.CalendarMode,
+    assessment_year: int,
+    parse_cache_folder: t.Optional[str],
+    jobs: int,
+    debug: bool,
+) -> t.List[ReadInput]:
+    """
+    Every input read, in input order. More than one job reads them in as many worker
+    processes, the inputs being independent of each other until merged
+    """
+    if jobs <= 1 or len(inputs) <= 1:
+        return [
+            __read_input(
+                operation_mode,
+                input_excel_file,
+                calendar_mode,
+                assessment_year,
+                parse_cache_folder,
+            )
+            for operation_mode, input_excel_file in inputs
+        ]
+
+    # a worker sees neither the refresh nor its threads, so the inputs reading
+    # refreshed data are held back until it is over, the rest starting meanwhile
+    input_order = sorted(
+        range(len(inputs)),
+        key=lambda index: inputs[index][0] in REFRESHED_DATA_OPERATION_MODES,
+    )
+    futures: t.Dict[int, Future[ReadInput]] = {}
+    # spawned rather than forked, the refresh threads of this process holding locks
+    # a forked child would inherit held
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(inputs)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=__set_debug,
+        initargs=(debug,),
+    ) as executor:
+        for index in input_order:
+            operation_mode, input_excel_file = inputs[index]
+            if operation_mode in REFRESHED_DATA_OPERATION_MODES:
+                pending_refresh.wait_all(refresh_manifest.SHARES_SOURCE)
+                pending_refresh.wait_all(refresh_manifest.RATES_SOURCE)
+            futures[index] = executor.submit(
+                __read_input,
+                operation_mode,
+                input_excel_file,
+                calendar_mode,
+                assessment_year,
+                parse_cache_folder,
+            )
+        return [futures[index].result() for index in range(len(inputs))]
+
+
+def merge_read_inputs(
+    inputs: t.List[t.Tuple[str, str]],
+    read_inputs: t.List[ReadInput],
+    output_folder: str,
+    calendar_mode: date_utils.CalendarMode,
+    assessment_year: int,
+) -> SectionDataMap:
+    """
+    Everything the inputs produced, in input order, as a run is the merge of them.
+
+    A schedule FA mode given more than one input has its entries built once, out of
+    the purchases of all of them, where its first input stands. Entries are built
+    per ticker, holdings acquired before the period adding up to one entry, so a
+    report split across files, its sheets exported as CSV for instance, gets the
+    entries and raw workings of the single report
+    """
+    sections: SectionDataMap = SectionDataMap()
+
+    def collect(parsed: SectionDataMap) -> None:
+        for section_type, rows in parsed.items():
+            sections.setdefault(section_type, []).extend(rows)
+
+    schedule_fa_purchases: t.Dict[str, t.List[TransactionWithTicker]] = {}
+    for (operation_mode, _), read_input in zip(inputs, read_inputs):
+        if read_input.purchases is not None:
+            schedule_fa_purchases.setdefault(operation_mode, []).extend(
+                read_input.purchases
+            )
+    for (operation_mode, _), read_input in zip(inputs, read_inputs):
+        collect(read_input.sections)
+        purchases = schedule_fa_purchases.pop(operation_mode, None)
+        if purchases is not None:
+            collect(
+                SCHEDULE_FA_PURCHASES_PARSERS[operation_mode](
+                    purchases,
+                    output_folder,
+                    operation_mode,
+                    calendar_mode,
+                    assessment_year,
+                )
+            )
+    return sections
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="This is a Python module to generate Indian ITR schedule FA under section A3 automatically"
@@ -86,7 +330,7 @@ def main() -> None:
         type=str,
         default=default_output_folder_abs_path,
         dest="output_folder",
-        help=f"Specify the absolute path of the absolute path of output folder for JSON data, default = {default_output_folder_abs_path}",
+        help=f"Specify the absolute path of the output folder for JSON data, default = {default_output_folder_abs_path}",
     )
     parser.add_argument(
         "-i",
@@ -104,6 +348,8 @@ def main() -> None:
         f" {INDMONEY_US_STOCKS_OPERATION_MODE} and the stocks/mutual funds capital"
         " gains statement for"
         f" {GROWW_INDIAN_STOCKS_OPERATION_MODE}/{GROWW_INDIAN_MF_OPERATION_MODE}."
+        " A sheet exported as CSV is read in place of the workbook, the file being"
+        " named after the sheet."
         f" {', '.join(SALE_OPERATION_PARSERS)} report realized sales and do not feed"
         " the schedule FA generation",
         required=True,
@@ -143,93 +389,166 @@ def main() -> None:
         help="Skip refreshing historic share prices from Yahoo Finance and use the "
         "bundled historic_data CSVs instead (useful when offline)",
     )
+    parser.add_argument(
+        "--refresh-ttl",
+        type=float,
+        default=refresh_manifest.DEFAULT_TTL_IN_S,
+        dest="refresh_ttl",
+        help="Seconds a refreshed ticker or currency is left alone for, default = "
+        f"{refresh_manifest.DEFAULT_TTL_IN_S}. Past it a source is still skipped when "
+        "it already covers the last working day",
+    )
+    parser.add_argument(
+        "--parse-cache-folder",
+        action="store",
+        type=str,
+        default=parse_cache.DEFAULT_CACHE_FOLDER_ABS_PATH,
+        dest="parse_cache_folder",
+        help="Specify the absolute path of the folder keeping the parsed inputs across "
+        "runs, so that an input unchanged since an earlier run is not parsed again, "
+        f"default = {parse_cache.DEFAULT_CACHE_FOLDER_ABS_PATH}",
+    )
+    parser.add_argument(
+        "--no-parse-cache",
+        action="store_true",
+        dest="no_parse_cache",
+        default=False,
+        help="Parse every input again, neither reusing nor keeping the parsed inputs",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        type=int,
+        default=1,
+        dest="jobs",
+        help="Specify the number of processes reading the inputs in parallel, the "
+        "results being merged in input order, default = 1",
+    )
 
     args = parser.parse_args()
+    assert args.jobs >= 1, f"--jobs = {args.jobs} must be at least 1"
 
-    logger.DEBUG = args.debug
-    etrade_benefit_history_parser.DEBUG = args.debug
-    etrade_holdings_bystatus_parser.DEBUG = args.debug
-    for sale_operation_parsers in SALE_OPERATION_PARSERS.values():
-        for sale_operation_parser in sale_operation_parsers:
-            sale_operation_parser.DEBUG = args.debug
-    asset_aggregator.DEBUG = args.debug
+    __set_debug(args.debug)
 
-    # Refresh before parsing: RSU rows resolve their FMV from the share price CSV
-    # during parsing, so the historic data must be up to date beforehand.
+    # Refresh while parsing: RSU rows resolve their FMV from the share price CSV
+    # during parsing, which waits for the refresh of that ticker only.
     if not args.skip_refresh:
-        refresh_historic_data()
+        refresh_historic_data(args.refresh_ttl)
 
-    time_bounds_in_ms = date_utils.calendar_range(
-        args.calendar_mode, args.assessment_year
+    inputs = __parse_inputs(args.inputs)
+    read_inputs = read_all_inputs(
+        inputs,
+        args.calendar_mode,
+        args.assessment_year,
+        None if args.no_parse_cache else args.parse_cache_folder,
+        args.jobs,
+        args.debug,
+    )
+    sections = merge_read_inputs(
+        inputs,
+        read_inputs,
+        args.output_folder,
+        args.calendar_mode,
+        args.assessment_year,
     )
 
-    # every parser hands back its rows keyed by the section they are filed under, so
-    # a run is the merge of everything its inputs produced
-    sections: SectionDataMap = SectionDataMap()
+    asset_aggregator.parse(sections, args.output_folder)
+
+
+def __refresh_share_prices(ticker: str, end: str, deadline: float) -> None:
+    try:
+        refresh(ticker, DEFAULT_START, end, deadline_in_s=deadline - time.monotonic())
+    except SystemExit as err:
+        logger.log(
+            f"Skipping share price refresh for {ticker} ({err}); using bundled "
+            "historic data. Pass --skip-refresh to suppress this."
+        )
+    # a refresh reaches the network and the parsers, so it falls back to the
+    # bundled data whatever the source raised
+    # pylint: disable-next=broad-exception-caught
+    except Exception as err:
+        logger.log(
+            f"Could not refresh share prices for {ticker} ({err}); "
+            "using bundled historic data."
+        )
+
+
+def __refresh_rates(currencies: t.List[str], deadline: float) -> None:
+    try:
+        refresh_rbi_rates.refresh(
+            currencies,
+            refresh_rbi_rates.DEFAULT_START,
+            date.today().isoformat(),
+            deadline_in_s=deadline - time.monotonic(),
+        )
+    except SystemExit as err:
+        logger.log(
+            f"Skipping reference rate refresh ({err}); using bundled rates. "
+            "Pass --skip-refresh to suppress this."
+        )
+    # a refresh reaches the network and the parsers, so it falls back to the
+    # bundled data whatever the source raised
+    # pylint: disable-next=broad-exception-caught
+    except Exception as err:
+        logger.log(f"Could not refresh reference rates ({err}); using bundled rates.")
 
-    def collect(parsed: SectionDataMap) -> None:
-        for section_type, rows in parsed.items():
-            sections.setdefault(section_type, []).extend(rows)
 
-    for operation_mode, input_excel_file in __parse_inputs(args.inputs):
-        if operation_mode in SALE_OPERATION_PARSERS:
-            for sale_operation_parser in SALE_OPERATION_PARSERS[operation_mode]:
-                collect(
-                    sale_operation_parser.parse(
-                        input_excel_file, time_bounds_in_ms=time_bounds_in_ms
+def __start_in_background(
+    slots: threading.BoundedSemaphore,
+    deadline: float,
+    description: str,
+    refresh_source: t.Callable[[], None],
+) -> Future[None]:
+    """
+    Runs the refresh on a thread of its own once one of the slots is free, the
+    future being done when it is. The thread is a daemon, which the interpreter
+    does not join at exit, so a refresh still running when the run is over is
+    abandoned rather than holding the end of the run back. Every file it writes is
+    replaced atomically, so what it leaves behind is whole
+    """
+    future: Future[None] = Future()
+
+    def run() -> None:
+        with slots:
+            try:
+                # a refresh waiting on a slot until past the deadline has no time
+                # left to fetch anything in
+                if time.monotonic() < deadline:
+                    refresh_source()
+                else:
+                    logger.log(
+                        f"Refreshing {description} never started before the"
+                        " deadline; using bundled historic data."
                     )
-                )
-        elif operation_mode == ETRADE_HOLDINGS_BYSTATUS_OPERATION_MODE:
-            collect(
-                etrade_holdings_bystatus_parser.parse(
-                    input_excel_file,
-                    args.output_folder,
-                    operation_mode,
-                    args.calendar_mode,
-                    args.assessment_year,
-                )
-            )
-        elif operation_mode == ETRADE_BENEFIT_HISTORY_OPERATION_MODE:
-            collect(
-                etrade_benefit_history_parser.parse(
-                    input_excel_file,
-                    args.output_folder,
-                    operation_mode,
-                    args.calendar_mode,
-                    args.assessment_year,
-                    time_bounds_in_ms=(
-                        None,
-                        date_utils.calendar_range("calendar", args.assessment_year)[1],
-                    ),
-                )
-            )
+            finally:
+                # a refresh handles its own failures, so it only ever ends
+                future.set_result(None)
 
-    asset_aggregator.parse(sections, args.output_folder)
+    threading.Thread(target=run, name=f"refresh {description}", daemon=True).start()
+    return future
 
 
-def refresh_historic_data() -> None:
+def refresh_historic_data(
+    ttl_in_s: float = refresh_manifest.DEFAULT_TTL_IN_S,
+) -> None:
     """Best-effort refresh of historic share prices and RBI/FBIL reference rates
     for every configured ticker. Failures (missing dependency, no network) are
-    logged and ignored so the run falls back to the bundled historic_data."""
+    logged and ignored so the run falls back to the bundled historic_data.
+
+    Every ticker and the rates are refreshed concurrently in the background, the
+    call returning once they are started. A lookup of share prices or rates waits
+    for the refresh of that ticker or of the rates only, so parsing whatever needs
+    neither goes on meanwhile, and a source still running `REFRESH_TIMEOUT_IN_S`
+    after the start is left behind with the bundled data in its place. The run
+    does not wait for a refresh to end, one still running as it is over being
+    abandoned.
+
+    A ticker or currency the refresh manifest holds as fresh within `ttl_in_s`, or
+    as already covering the last working day, is not refreshed at all."""
     end = (date.today() + timedelta(days=1)).isoformat()
     tickers = sorted(ticker_org_info)
-    for ticker in tickers:
-        try:
-            refresh(ticker, DEFAULT_START, end)
-        except SystemExit as err:
-            logger.log(
-                f"Skipping share price refresh for {ticker} ({err}); using bundled "
-                "historic data. Pass --skip-refresh to suppress this."
-            )
-        # a refresh reaches the network and the parsers, so it falls back to the
-        # bundled data whatever the source raised
-        # pylint: disable-next=broad-exception-caught
-        except Exception as err:
-            logger.log(
-                f"Could not refresh share prices for {ticker} ({err}); "
-                "using bundled historic data."
-            )
-
     currencies = sorted(
         {
             ticker_currency_info[ticker]
@@ -237,22 +556,59 @@ def refresh_historic_data() -> None:
             if ticker in ticker_currency_info
         }
     )
+    fresh_tickers = [
+        ticker
+        for ticker in tickers
+        if refresh_manifest.is_fresh(refresh_manifest.SHARES_SOURCE, ticker, ttl_in_s)
+    ]
+    fresh_currencies = [
+        currency
+        for currency in currencies
+        if refresh_manifest.is_fresh(refresh_manifest.RATES_SOURCE, currency, ttl_in_s)
+    ]
+    if fresh_tickers or fresh_currencies:
+        logger.log(
+            f"Skipping the refresh of {fresh_tickers + fresh_currencies}, which "
+            "cannot have anything new yet"
+        )
+    tickers = [ticker for ticker in tickers if ticker not in fresh_tickers]
+    currencies = [
+        currency for currency in currencies if currency not in fresh_currencies
+    ]
+    if not tickers and not currencies:
+        return
+
+    slots = threading.BoundedSemaphore(REFRESH_MAX_WORKERS)
+    deadline = time.monotonic() + REFRESH_TIMEOUT_IN_S
+    for ticker in tickers:
+        pending_refresh.register(
+            refresh_manifest.SHARES_SOURCE,
+            ticker,
+            pending_refresh.PendingRefresh(
+                future=__start_in_background(
+                    slots,
+                    deadline,
+                    f"share prices for {ticker}",
+                    functools.partial(__refresh_share_prices, ticker, end, deadline),
+                ),
+                deadline=deadline,
+                description=f"share prices for {ticker}",
+            ),
+        )
     if currencies:
-        try:
-            refresh_rbi_rates.refresh(
-                currencies, refresh_rbi_rates.DEFAULT_START, date.today().isoformat()
-            )
-        except SystemExit as err:
-            logger.log(
-                f"Skipping reference rate refresh ({err}); using bundled rates. "
-                "Pass --skip-refresh to suppress this."
-            )
-        # a refresh reaches the network and the parsers, so it falls back to the
-        # bundled data whatever the source raised
-        # pylint: disable-next=broad-exception-caught
-        except Exception as err:
-            logger.log(
-                f"Could not refresh reference rates ({err}); using bundled rates."
+        rates_refresh = pending_refresh.PendingRefresh(
+            future=__start_in_background(
+                slots,
+                deadline,
+                "reference rates",
+                functools.partial(__refresh_rates, currencies, deadline),
+            ),
+            deadline=deadline,
+            description="reference rates",
+        )
+        for currency in currencies:
+            pending_refresh.register(
+                refresh_manifest.RATES_SOURCE, currency, rates_refresh
             )
 
 
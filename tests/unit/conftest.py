@@ -0,0 +1,43 @@
+"""
+conftest.py for the fixtures every unit test shares
+
+See [conftest.py](https://docs.pytest.org/en/stable/reference/fixtures.html#conftest-py-sharing-fixtures-across-multiple-files)
+"""
+
+import os
+
+import pytest
+
+from utils import compiled_share_data
+from utils.rates import rbi_rates_utils
+
+HISTORIC_DATA_ABS_PATH = os.path.realpath(
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "historic_data")
+)
+
+
+@pytest.fixture(autouse=True)
+def fixture_caches_outside_historic_data(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    """
+    Tests reading the bundled share prices and reference rates compile their
+    caches under `tmp_path` rather than beside the bundled data
+    """
+
+    def relocate(path: str) -> str:
+        relative_path = os.path.relpath(os.path.realpath(path), HISTORIC_DATA_ABS_PATH)
+        if relative_path.startswith(os.pardir):
+            return path
+        return os.path.join(tmp_path, "historic_data", relative_path)
+
+    compiled_path = compiled_share_data.compiled_path
+    cache_path = rbi_rates_utils.cache_path
+    monkeypatch.setattr(
+        compiled_share_data,
+        "compiled_path",
+        lambda source_path: relocate(compiled_path(source_path)),
+    )
+    monkeypatch.setattr(
+        rbi_rates_utils,
+        "cache_path",
+        lambda rates_path: relocate(cache_path(rates_path)),
+    )
@@ -17,6 +17,7 @@ import pytest
 # pylint: disable-next=wrong-import-order
 from parser.demat.etrade import etrade_benefit_history_parser
 from utils import date_utils
+from utils.excel_utils import WorkbookReader
 
 
 @pytest.fixture(name="time_bounds_in_ms")
@@ -55,7 +56,7 @@ def fixture_benefit_history_excel_file_with_vested_and_released_espp():
 
 
 def create_espp_mock(data_frame_obj) -> MagicMock:
-    mock_excel_file = MagicMock(spec=pd.ExcelFile)
+    mock_excel_file = MagicMock(spec=WorkbookReader)
     mock_excel_file.parse.return_value = pd.DataFrame(data_frame_obj)
     mock_excel_file.sheet_names = [etrade_benefit_history_parser.ESPP_SHEET_NAME]
     return mock_excel_file
@@ -105,11 +106,20 @@ def fixture_benefit_history_excel_file_with_espp_and_rsu():
 
 
 def create_benefit_history_mock(data_frame_dict: t.Dict[str, t.Any]) -> MagicMock:
-    mock_excel_file = MagicMock(spec=pd.ExcelFile)
-
-    def parse(sheet_name: str, skiprows: int, header: int):
+    mock_excel_file = MagicMock(spec=WorkbookReader)
+
+    def parse(
+        sheet_name: str,
+        skiprows: int,
+        header: int,
+        usecols: t.Optional[t.Collection[str]] = None,
+    ):
         print(f"called with skiprows = {skiprows} and header = {header}")
-        return pd.DataFrame(data_frame_dict[sheet_name])
+        sheet_pd = pd.DataFrame(data_frame_dict[sheet_name])
+        if usecols is None:
+            return sheet_pd
+        # the columns a reader keeps, a name the sheet lacks being left out
+        return sheet_pd[[column for column in sheet_pd.columns if column in usecols]]
 
     mock_excel_file.parse = parse
     mock_excel_file.sheet_names = data_frame_dict.keys()
@@ -1,11 +1,13 @@
 from parser.demat.etrade import etrade_benefit_history_parser
 import pandas as pd
 
+from tests.unit.parser.demat.etrade.conftest import create_espp_mock
 from utils import date_utils
+from utils.excel_utils import WorkbookReader
 
 
 def test_espp_parsing_with_no_purchase(
-    benefit_history_excel_file_with_no_purchase_espp: pd.ExcelFile,
+    benefit_history_excel_file_with_no_purchase_espp: WorkbookReader,
     time_bounds_in_ms: date_utils.DateBoundsInMs,
 ):
     espp_purchase = etrade_benefit_history_parser.parse_espp(
@@ -90,7 +92,7 @@ def test_espp_parsing_row_excludes_tax_collection_shares():
 
 
 def test_espp_parsing_with_only_released_shares(
-    benefit_history_excel_file_with_vested_and_released_espp: pd.ExcelFile,
+    benefit_history_excel_file_with_vested_and_released_espp: WorkbookReader,
     time_bounds_in_ms: date_utils.DateBoundsInMs,
 ):
     espp_purchases = etrade_benefit_history_parser.parse_espp(
@@ -108,3 +110,27 @@ def test_espp_parsing_with_only_released_shares(
         "orig_disp_time": "30-JUN-2020",
         "time_in_millis": 1593475200000,
     }
+
+
+def test_espp_parsing_matches_the_row_parser(
+    time_bounds_in_ms: date_utils.DateBoundsInMs,
+):
+    espp_sheet = {
+        "Record Type": ["Purchase", "Event", "Purchase", "Event"],
+        "Symbol": ["ADBE", "", "ADBE", ""],
+        "Purchase Date": ["30-JUN-2020", "", "30-DEC-2022", ""],
+        "Purchased Qty.": ["3", None, "22.628", None],
+        "Net Shares": ["2", None, "21.628", None],
+        "Sellable Qty.": ["2", None, "11.628", None],
+        "Qty. or Amount": [None, 0.5, None, 1.0],
+        "Purchase Date FMV": ["$435.31", None, "$336.53", None],
+    }
+    espp_purchases = etrade_benefit_history_parser.parse_espp(
+        create_espp_mock(espp_sheet), time_bounds_in_ms
+    )
+    row_purchases = [
+        etrade_benefit_history_parser.parse_espp_row(data)
+        for _, data in pd.DataFrame(espp_sheet).iterrows()
+        if data["Record Type"] == "Purchase"
+    ]
+    assert espp_purchases == row_purchases
@@ -0,0 +1,24 @@
+# the project's own `parser` package carries the name of a stdlib module, so its
+# imports are ordered as though they were standard ones
+# pylint: disable-next=wrong-import-order
+from parser.demat.etrade import etrade_holdings_bystatus_parser
+
+
+def test_sellable_quantities_of_a_csv_export_are_numbers(tmp_path):
+    # a quantity printed with a thousands separator leaves the column read as text
+    sellable_path = (
+        tmp_path / f"{etrade_holdings_bystatus_parser.SELLABLE_SHEET_NAME}.csv"
+    )
+    sellable_path.write_text(
+        "Symbol,Date Acquired,Purchase Date FMV,Sellable Qty.\n"
+        'ADBE,30-JUN-2020,$435.31,"1,200"\n'
+        "ADBE,31-DEC-2020,$500.10,2.5\n"
+        'Overall Total,,,"1,202.5"\n',
+        encoding="utf-8",
+    )
+
+    purchases = etrade_holdings_bystatus_parser.read_purchases(str(sellable_path))
+
+    assert purchases is not None
+    assert [purchase.purchase.quantity for purchase in purchases] == [1200.0, 2.5]
+    assert sum(purchase.purchase.quantity for purchase in purchases) == 1202.5
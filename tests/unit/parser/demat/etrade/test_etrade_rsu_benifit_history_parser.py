@@ -7,11 +7,12 @@ import pandas as pd
 from parser.demat.etrade import etrade_benefit_history_parser
 
 from tests.unit.parser.demat.etrade.conftest import create_rsu_mock
-from utils import date_utils
+from utils import date_utils, share_data_utils
+from utils.excel_utils import WorkbookReader
 
 
 def test_rsu_parsing_with_only_vest(
-    benefit_history_excel_file_with_vested_rsu: pd.ExcelFile,
+    benefit_history_excel_file_with_vested_rsu: WorkbookReader,
     time_bounds_in_ms: date_utils.DateBoundsInMs,
 ):
     rsu_purchase = etrade_benefit_history_parser.parse_rsu(
@@ -21,7 +22,7 @@ def test_rsu_parsing_with_only_vest(
 
 
 def test_rsu_parsing_with_only_released_shares(
-    benefit_history_excel_file_with_vested_and_released_rsu: pd.ExcelFile,
+    benefit_history_excel_file_with_vested_and_released_rsu: WorkbookReader,
     time_bounds_in_ms: date_utils.DateBoundsInMs,
 ):
     rsu_purchases = etrade_benefit_history_parser.parse_rsu(
@@ -38,6 +39,38 @@ def test_rsu_parsing_with_only_released_shares(
     }
 
 
+def test_rsu_parsing_resolves_the_fmv_of_every_release(
+    time_bounds_in_ms: date_utils.DateBoundsInMs,
+):
+    rsu_sheet = create_rsu_mock(
+        {
+            "Record Type": ["Grant", "Event", "Event", "Grant", "Event"],
+            "Symbol": ["ADBE", "", "", "ADBE", ""],
+            "Event Type": [
+                "",
+                "Shares released",
+                "Shares released",
+                "",
+                "Shares released",
+            ],
+            "Date": ["", "10/15/2023", "01/15/2023", "", "07/15/2022"],
+            "Qty. or Amount": [None, 0.5, 1.5, None, 2.5],
+        }
+    )
+    rsu_purchases = etrade_benefit_history_parser.parse_rsu(
+        rsu_sheet, time_bounds_in_ms
+    )
+    assert [purchase.purchase.quantity for purchase in rsu_purchases] == [
+        0.5,
+        1.5,
+        2.5,
+    ]
+    for rsu_purchase in rsu_purchases:
+        assert rsu_purchase.purchase.fmv.price == share_data_utils.get_fmv(
+            "adbe", rsu_purchase.purchase.date["time_in_millis"]
+        )
+
+
 def test_wrong_rsu_sheet_without_grant(
     time_bounds_in_ms: date_utils.DateBoundsInMs,
 ):
@@ -82,3 +115,26 @@ def test_rsu_row_with_released_share():
 
     assert rsu_purchase is not None
     assert rsu_purchase.purchase.quantity == 0.5
+
+
+def test_rsu_quantities_of_a_csv_export_are_numbers(
+    tmp_path, time_bounds_in_ms: date_utils.DateBoundsInMs
+):
+    # the "$" amount of a tax withholding leaves the whole column read as text
+    rsu_path = tmp_path / f"{etrade_benefit_history_parser.RSU_SHEET_NAME}.csv"
+    rsu_path.write_text(
+        "Record Type,Symbol,Event Type,Date,Qty. or Amount\n"
+        "Grant,ADBE,,,\n"
+        "Event,,Shares vested,10/15/2023,3\n"
+        "Event,,Tax withholding,10/15/2023,$512.40\n"
+        "Event,,Shares released,10/15/2023,2\n",
+        encoding="utf-8",
+    )
+
+    purchases = etrade_benefit_history_parser.read_purchases(
+        str(rsu_path), time_bounds_in_ms
+    )
+
+    assert purchases is not None
+    assert [purchase.purchase.quantity for purchase in purchases] == [2.0]
+    assert isinstance(purchases[0].purchase.quantity, float)
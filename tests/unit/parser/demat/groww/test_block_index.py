@@ -0,0 +1,44 @@
+import pandas as pd
+
+# the project's own `parser` package carries the name of a stdlib module, so its
+# imports are ordered as though they were standard ones
+# pylint: disable-next=wrong-import-order
+from parser.demat.groww import block_index
+
+LABELS = ("Short Term trades", "Long Term trades")
+
+
+def test_index_cuts_each_block_at_the_next_blank_row_or_label():
+    sheet_pd = pd.DataFrame(
+        [
+            ["Short Term trades", None],
+            ["Stock name", "ISIN"],
+            ["TCS", "INE1"],
+            ["INFY", "INE2"],
+            ["Long Term trades", None],
+            ["Stock name", "ISIN"],
+            ["TCS", "INE1"],
+            [None, None],
+            ["Disclaimer", None],
+        ]
+    )
+
+    index = block_index.build(sheet_pd, LABELS, "Stock name")
+
+    assert index.labels == [(0, "Short Term trades"), (4, "Long Term trades")]
+    assert [index.header_row_after(row_index) for row_index, _ in index.labels] == [
+        1,
+        5,
+    ]
+    assert index.block_end_after(1) == 4
+    assert index.block_end_after(5) == 7
+    assert index.first_label_row("Intraday trades") is None
+
+
+def test_index_of_a_block_running_to_the_end_of_the_sheet():
+    sheet_pd = pd.DataFrame([["Long Term trades"], ["Stock name"], ["TCS"]])
+
+    index = block_index.build(sheet_pd, LABELS, "Stock name")
+
+    assert index.block_end_after(1) == 3
+    assert index.header_row_after(1) is None
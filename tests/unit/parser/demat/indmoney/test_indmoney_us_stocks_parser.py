@@ -0,0 +1,272 @@
+from datetime import datetime
+import typing as t
+
+import numpy as np
+import openpyxl
+import pytest
+
+# the project's own `parser` package carries the name of a stdlib module, so its
+# imports are ordered as though they were standard ones
+# pylint: disable-next=wrong-import-order
+from parser.demat.indmoney import indmoney_us_stocks_parser
+from models.asset_sale import AssetSale
+from models.itr.faa3 import FAA3
+from models.section_type import SectionType
+from utils import date_utils
+from utils.excel_utils import open_report
+from utils.rates import rbi_rates_utils
+
+USD_RATE = 80.0
+
+MAIN_HEADER = [
+    "Name of Stock",
+    "Broker name",
+    "Purchase date",
+    "Sell date",
+    "Qty sold",
+    "Exchange Rate",
+    "Total (in US$)",
+    None,
+    "Expense (in INR)",
+    None,
+]
+SUB_HEADER = [
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    "Sell Value",
+    "Purchase Value",
+    "On Sale of Shares",
+    "On Purchase of Shares",
+]
+FA_HEADER = [
+    "Country Name",
+    "Country Code",
+    "Name of the entity",
+    "Address of the entity",
+    "ZIP Code",
+    "Nature of entity",
+    "Date of acquiring interest",
+    "Initial value of investment",
+    "Peak value of investment",
+    "Closing Balance",
+    "Total gross amount paid/credited to the holding during the period",
+    "Total gross proceeds from sale or redemption of investment during the period",
+]
+
+
+@pytest.fixture(autouse=True)
+def fixture_usd_rate(monkeypatch: pytest.MonkeyPatch):
+    """
+    The same rate for every month of 2019 to 2024
+    """
+    monkeypatch.setitem(
+        rbi_rates_utils.rate_map_cache,
+        "USD",
+        rbi_rates_utils.RbiRateTable(
+            first_month_index=rbi_rates_utils.month_index(2019, 1),
+            rates=np.full(6 * 12, USD_RATE, dtype=np.float64),
+        ),
+    )
+
+
+def append_rows(sheet: t.Any, rows: t.List[t.List[t.Any]]) -> None:
+    for row in rows:
+        sheet.append(row)
+
+
+@pytest.fixture(name="report_path")
+def fixture_report_path(tmp_path) -> str:
+    """
+    A consolidated tax report with its capital gain tables split by the markers
+    and dashes INDmoney prints, and notes past the end of every table
+    """
+    workbook = openpyxl.Workbook()
+    stcg = workbook.active
+    assert stcg is not None
+    stcg.title = "Short Term Capital Gains"
+    append_rows(
+        stcg,
+        [
+            ["Short Term Capital Gains - US Stocks"],
+            [],
+            MAIN_HEADER,
+            SUB_HEADER,
+            ["Gains"],
+            ["Apple Inc", "INDmoney", "2023-01-10", "2023-06-15", 2, 82.1]
+            + [400.0, 300.0, 10.0, 5.0],
+            ["-"],
+            ["Losses"],
+            # a date stored as a real date rather than as text
+            ["Tesla Inc", "INDmoney", datetime(2023, 2, 1), datetime(2023, 3, 20)]
+            + ["1.5", 82.0, "150", "180", "4", 0],
+            ["-"],
+            ["Total", None, None, None, 3.5, None, 550.0, 480.0, 14.0, 5.0],
+            [],
+            ["Gains are stated before the expenses"],
+        ],
+    )
+    # matches the short term pattern without holding a US stocks table
+    other = workbook.create_sheet("STCG Mutual Funds")
+    append_rows(other, [["Scheme Name", "Units"], ["Index Fund", 10]])
+    ltcg = workbook.create_sheet("LTCG")
+    append_rows(
+        ltcg,
+        [
+            MAIN_HEADER[:3] + ["Redemption date"] + MAIN_HEADER[4:],
+            SUB_HEADER,
+            ["Gains"],
+            ["Microsoft Corp", "INDmoney", "2020-05-01", "2023-08-01", 3, 82.5]
+            + [900.0, 600.0, 6.0, 3.0],
+            # sold before the period
+            ["Adobe Inc", "INDmoney", "2019-05-01", "2022-12-01", 1, 81.0]
+            + [500.0, 400.0, 1.0, 1.0],
+            ["-"],
+            ["Total", None, None, None, 4, None, 1400.0, 1000.0, 7.0, 4.0],
+            ["Microsoft Corp", "INDmoney", "2020-05-01", "2023-09-01", 3, 82.5]
+            + [900.0, 600.0, 6.0, 3.0],
+        ],
+    )
+    schedule_fa = workbook.create_sheet("Schedule FA")
+    append_rows(
+        schedule_fa,
+        [
+            ["A2 - Foreign custodial accounts"],
+            ["Country Name", "Name of financial institution", "Account number"],
+            ["United States", "DriveWealth LLC", "ABC123"],
+            [],
+            ["A3 - Foreign equity and debt interest"],
+            FA_HEADER,
+            ["United States", "002", "Apple Inc", "One Apple Park Way, Cupertino"]
+            + ["95014", "Listed company", "2022-01-10", 24000, 30000, 28000, 0, 0],
+            ["United States", 2, "Tesla, Inc", "1 Tesla Road Austin"]
+            + ["78725", "Listed company", "2023-02-01", 14400, 16000, 0, 0, 12000],
+            [],
+            ["Values are stated in INR"],
+        ],
+    )
+    path = str(tmp_path / "INDmoney_Tax_Report.xlsx")
+    workbook.save(path)
+    return path
+
+
+def test_report_is_parsed_into_its_sections(report_path):
+    sections = indmoney_us_stocks_parser.parse(
+        report_path, date_utils.calendar_range("calendar", 2024)
+    )
+
+    assert list(sections) == [
+        SectionType.SECTION_SLAB_SHORT,
+        SectionType.SECTION_SLAB_LONG,
+        SectionType.SCHEDULE_FA_A3,
+    ]
+    short_sales = sections.get_rows_asserting(
+        [SectionType.SECTION_SLAB_SHORT], AssetSale
+    )
+    long_sales = sections.get_rows_asserting([SectionType.SECTION_SLAB_LONG], AssetSale)
+    # sorted by the date of sale, whichever block of the sheet they were under
+    assert [
+        (
+            sale.asset_description,
+            sale.broker,
+            sale.sale_transaction.date["disp_time"],
+            sale.purchase_transaction.date["disp_time"],
+            sale.sale_transaction.quantity,
+            sale.sale_transaction.fmv.price,
+            sale.purchase_transaction.fmv.price,
+            sale.expense_exempted.price,
+            sale.gains.price,
+        )
+        for sale in short_sales + long_sales
+    ] == [
+        (
+            "Tesla Inc",
+            "INDmoney",
+            "20-Mar-2023",
+            "01-Feb-2023",
+            1.5,
+            100.0,
+            120.0,
+            4.0,
+            (150.0 - 180.0) * USD_RATE - 4.0,
+        ),
+        (
+            "Apple Inc",
+            "INDmoney",
+            "15-Jun-2023",
+            "10-Jan-2023",
+            2.0,
+            200.0,
+            150.0,
+            15.0,
+            (400.0 - 300.0) * USD_RATE - 15.0,
+        ),
+        (
+            "Microsoft Corp",
+            "INDmoney",
+            "01-Aug-2023",
+            "01-May-2020",
+            3.0,
+            300.0,
+            200.0,
+            9.0,
+            (900.0 - 600.0) * USD_RATE - 9.0,
+        ),
+    ]
+    assert all(sale.sale_exchange_rate == USD_RATE for sale in short_sales)
+
+
+def test_schedule_fa_entries_are_read_from_section_a3_only(report_path):
+    sections = indmoney_us_stocks_parser.parse(report_path)
+
+    assert [
+        (
+            entry.org.country_name,
+            entry.org.country_code,
+            entry.org.name,
+            entry.org.address,
+            entry.org.zip_code,
+            entry.purchase_date["disp_time"],
+            entry.purchase_price,
+            entry.peak_price,
+            entry.closing_price,
+            entry.gross_amount_paid,
+            entry.gross_sale_proceeds,
+        )
+        for entry in sections.get_rows_asserting([SectionType.SCHEDULE_FA_A3], FAA3)
+    ] == [
+        (
+            "United States",
+            "2",
+            "Apple Inc",
+            "One Apple Park Way Cupertino",
+            "95014",
+            "10-Jan-2022",
+            24000.0,
+            30000.0,
+            28000.0,
+            0.0,
+            0.0,
+        ),
+        (
+            "United States",
+            "2",
+            "Tesla Inc",
+            "1 Tesla Road Austin",
+            "78725",
+            "01-Feb-2023",
+            14400.0,
+            16000.0,
+            0.0,
+            0.0,
+            12000.0,
+        ),
+    ]
+
+
+def test_sheet_without_a_us_stocks_table_is_skipped(report_path):
+    with open_report(report_path) as xl:
+        assert not indmoney_us_stocks_parser.parse_sheet(xl, "STCG Mutual Funds", None)
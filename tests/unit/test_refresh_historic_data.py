@@ -0,0 +1,134 @@
+import os
+import typing as t
+
+import pandas as pd
+import pytest
+
+import refresh_historic_data
+from utils import cache_utils, refresh_manifest
+
+TICKER = "tst"
+STORED_CSV = """Date,Adj Close,Close,High,Low,Open,Volume
+2024-01-02,9.5,10.0,10.5,9.5,9.75,100
+2024-01-03,10.5,11.0,11.5,10.5,10.75,100
+"""
+
+
+def yfinance_frame(rows: t.List[t.Tuple[str, float]]) -> pd.DataFrame:
+    """
+    A frame shaped like the one `yf.download` returns for a single ticker
+    """
+    return pd.DataFrame(
+        {
+            ("Adj Close", TICKER.upper()): [close - 0.5 for _, close in rows],
+            ("Close", TICKER.upper()): [close for _, close in rows],
+            ("High", TICKER.upper()): [close + 0.5 for _, close in rows],
+            ("Low", TICKER.upper()): [close - 0.5 for _, close in rows],
+            ("Open", TICKER.upper()): [close - 0.25 for _, close in rows],
+            ("Volume", TICKER.upper()): [100] * len(rows),
+        },
+        index=pd.DatetimeIndex([date for date, _ in rows], name="Date"),
+    )
+
+
+@pytest.fixture(name="downloads")
+def fixture_downloads(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """
+    Records the start of every download, serving the rows from that start on
+    """
+    monkeypatch.setattr(refresh_historic_data, "SHARES_FOLDER", str(tmp_path))
+    monkeypatch.setattr(
+        refresh_manifest, "MANIFEST_FILE_ABS_PATH", str(tmp_path / "manifest.json")
+    )
+    served_rows: t.List[t.Tuple[str, float]] = []
+    starts: t.List[str] = []
+
+    def download(tickers: str, start: str, end: str, **_) -> pd.DataFrame:
+        assert tickers == TICKER.upper()
+        starts.append(start)
+        return yfinance_frame(
+            [(date, close) for date, close in served_rows if start <= date < end]
+        )
+
+    monkeypatch.setattr("yfinance.download", download)
+    return served_rows, starts
+
+
+def write_stored(csv: str) -> str:
+    path = refresh_historic_data.data_path(TICKER)
+    cache_utils.write_atomically(path, csv.encode("utf-8"))
+    return path
+
+
+def read(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def test_refresh_appends_only_the_days_after_the_last_stored_one(downloads):
+    served_rows, starts = downloads
+    served_rows.extend(
+        [("2024-01-02", 10.0), ("2024-01-03", 11.0), ("2024-01-04", 12.0)]
+    )
+    path = write_stored(STORED_CSV)
+
+    refresh_historic_data.refresh(TICKER, "2024-01-01", "2024-01-06")
+
+    assert starts == ["2024-01-02"]
+    assert read(path) == STORED_CSV + "2024-01-04,11.5,12.0,12.5,11.5,11.75,100\n"
+    manifest_entry = refresh_manifest.read()[refresh_manifest.SHARES_SOURCE][TICKER]
+    assert manifest_entry["last_date"] == "2024-01-04"
+
+
+def test_refresh_leaves_an_up_to_date_history_untouched(downloads):
+    served_rows, starts = downloads
+    served_rows.extend([("2024-01-02", 10.0), ("2024-01-03", 11.0)])
+    path = write_stored(STORED_CSV)
+    modified_at = os.stat(path).st_mtime_ns
+
+    refresh_historic_data.refresh(TICKER, "2024-01-01", "2024-01-06")
+    refresh_historic_data.refresh(TICKER, "2024-01-01", "2024-01-03")
+
+    assert starts == ["2024-01-02"]
+    assert read(path) == STORED_CSV
+    assert os.stat(path).st_mtime_ns == modified_at
+
+
+def test_refresh_replaces_a_partial_close_of_the_last_stored_day(downloads):
+    served_rows, starts = downloads
+    # the last stored close was fetched while its session was still trading
+    served_rows.extend(
+        [("2024-01-02", 10.0), ("2024-01-03", 11.25), ("2024-01-04", 12.0)]
+    )
+    path = write_stored(STORED_CSV)
+
+    refresh_historic_data.refresh(TICKER, "2024-01-01", "2024-01-06")
+
+    assert starts == ["2024-01-02"]
+    assert read(path) == (
+        STORED_CSV.rpartition("2024-01-03")[0]
+        + "2024-01-03,10.75,11.25,11.75,10.75,11.0,100\n"
+        + "2024-01-04,11.5,12.0,12.5,11.5,11.75,100\n"
+    )
+
+
+def test_refresh_downloads_the_full_history_when_the_overlap_differs(downloads):
+    served_rows, starts = downloads
+    # a 2:1 split halves every close Yahoo serves
+    served_rows.extend([("2024-01-02", 5.0), ("2024-01-03", 5.5), ("2024-01-04", 6.0)])
+    path = write_stored(STORED_CSV)
+
+    refresh_historic_data.refresh(TICKER, "2024-01-01", "2024-01-06")
+
+    assert starts == ["2024-01-02", "2024-01-01"]
+    assert pd.read_csv(path)["Close"].tolist() == [5.0, 5.5, 6.0]
+
+
+def test_refresh_downloads_the_full_history_without_a_stored_one(downloads):
+    served_rows, starts = downloads
+    served_rows.extend([("2024-01-02", 10.0), ("2024-01-03", 11.0)])
+
+    path = refresh_historic_data.refresh(TICKER, "2024-01-01", "2024-01-06")
+
+    assert starts == ["2024-01-01"]
+    assert pd.read_csv(path)["Date"].tolist() == ["2024-01-02", "2024-01-03"]
@@ -0,0 +1,109 @@
+import os
+import typing as t
+
+import pytest
+
+import refresh_rbi_rates
+from utils import refresh_manifest
+from utils.rates import rbi_rates_utils
+
+# FBIL publications served by the stubbed Frankfurter API, by date
+PUBLISHED_RATES = {
+    "2024-01-15": 82.5,
+    "2024-01-31": 83.0,
+    "2024-02-15": 83.5,
+    "2024-02-29": 84.0,
+    "2024-03-14": 84.5,
+}
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload: t.List[t.Dict[str, t.Any]]):
+        self.payload = payload
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> t.List[t.Dict[str, t.Any]]:
+        return self.payload
+
+
+@pytest.fixture(name="fetches")
+def fixture_fetches(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """
+    Records the (from, to) of every fetch, serving the rates published in between
+    """
+    monkeypatch.setattr(
+        refresh_manifest, "MANIFEST_FILE_ABS_PATH", str(tmp_path / "manifest.json")
+    )
+    fetches: t.List[t.Tuple[str, str]] = []
+
+    def get(_session, url: str, params: t.Dict[str, str], **_) -> FakeResponse:
+        assert url == refresh_rbi_rates.FRANKFURTER_URL
+        fetches.append((params["from"], params["to"]))
+        return FakeResponse(
+            [
+                {"date": rate_date, "quote": "INR", "rate": rate}
+                for rate_date, rate in PUBLISHED_RATES.items()
+                if params["from"] <= rate_date <= params["to"]
+            ]
+        )
+
+    monkeypatch.setattr("requests.Session.get", get)
+    return fetches
+
+
+def usd_rates(rates_path: str) -> t.List[float]:
+    table = rbi_rates_utils.read_rate_tables(rates_path)["USD"]
+    return [float(rate) for rate in table.rates]
+
+
+def test_refresh_fetches_only_from_the_last_month_held_on(tmp_path, fetches):
+    rates_path = str(tmp_path / "rates.xlsx")
+    refresh_rbi_rates.refresh(["USD"], "2024-01-01", "2024-02-20", rates_path)
+
+    refresh_rbi_rates.refresh(["USD"], "2024-01-01", "2024-03-31", rates_path)
+
+    assert fetches == [("2024-01-01", "2024-02-20"), ("2024-02-01", "2024-03-31")]
+    # February's month end moved from the 15th to the 29th
+    assert usd_rates(rates_path) == [83.0, 84.0, 84.5]
+
+
+def test_refresh_leaves_a_workbook_without_new_rates_untouched(
+    tmp_path, fetches, capsys
+):
+    rates_path = str(tmp_path / "rates.xlsx")
+    refresh_rbi_rates.refresh(["USD"], "2024-01-01", "2024-03-31", rates_path)
+    capsys.readouterr()
+
+    refresh_rbi_rates.refresh(["USD"], "2024-01-01", "2024-03-31", rates_path)
+
+    assert fetches[-1] == ("2024-03-01", "2024-03-31")
+    assert "leaving it untouched" in capsys.readouterr().out
+
+
+def test_full_refresh_fetches_from_the_start(tmp_path, fetches):
+    rates_path = str(tmp_path / "rates.xlsx")
+    refresh_rbi_rates.refresh(["USD"], "2024-01-01", "2024-03-31", rates_path)
+
+    refresh_rbi_rates.refresh(
+        ["USD"], "2024-01-01", "2024-03-31", rates_path, full=True
+    )
+
+    assert fetches == [("2024-01-01", "2024-03-31")] * 2
+    assert usd_rates(rates_path) == [83.0, 84.0, 84.5]
+
+
+def test_refresh_replaces_the_workbook_rather_than_saving_over_it(tmp_path, fetches):
+    rates_path = str(tmp_path / "rates.xlsx")
+    refresh_rbi_rates.refresh(["USD"], "2024-01-01", "2024-02-20", rates_path)
+    inode = os.stat(rates_path).st_ino
+
+    refresh_rbi_rates.refresh(["USD"], "2024-01-01", "2024-03-31", rates_path)
+
+    # a reader opening the workbook meanwhile kept the whole earlier one
+    assert os.stat(rates_path).st_ino != inode
+    assert len(fetches) == 2
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
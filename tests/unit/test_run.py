@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+import typing as t
+from concurrent.futures import Future
+
+import pytest
+
+import run
+from models.section_data import SectionDataMap
+from models.section_type import SectionType
+from utils import pending_refresh, refresh_manifest
+
+BENEFIT_HISTORY = run.ETRADE_BENEFIT_HISTORY_OPERATION_MODE
+HOLDINGS = run.ETRADE_HOLDINGS_BYSTATUS_OPERATION_MODE
+GROWW_STOCKS = run.GROWW_INDIAN_STOCKS_OPERATION_MODE
+BROKEN_INPUT = "broken.csv"
+
+
+@pytest.fixture(name="built_entries")
+def fixture_built_entries(monkeypatch: pytest.MonkeyPatch):
+    """
+    Records the purchases every schedule FA mode builds its entries out of, each
+    purchase standing in as its own entry
+    """
+    calls: t.List[t.Tuple[str, t.List[t.Any]]] = []
+
+    def build(purchases, _output_folder, operation_mode, _calendar_mode, _year):
+        calls.append((operation_mode, list(purchases)))
+        return SectionDataMap({SectionType.SCHEDULE_FA_A3: list(purchases)})
+
+    monkeypatch.setattr(
+        run,
+        "SCHEDULE_FA_PURCHASES_PARSERS",
+        {mode: build for mode in run.SCHEDULE_FA_PURCHASES_PARSERS},
+    )
+    return calls
+
+
+def read_input(sections=None, purchases=None) -> run.ReadInput:
+    return run.ReadInput(sections=SectionDataMap(sections or {}), purchases=purchases)
+
+
+def test_a_mode_given_many_inputs_builds_its_entries_once(built_entries):
+    inputs = [
+        (BENEFIT_HISTORY, "ESPP.csv"),
+        (run.INDMONEY_US_STOCKS_OPERATION_MODE, "Schedule FA.csv"),
+        (BENEFIT_HISTORY, "Restricted Stock.csv"),
+        (HOLDINGS, "Sellable.csv"),
+    ]
+    read_inputs = [
+        read_input(purchases=["espp"]),
+        read_input(sections={SectionType.SCHEDULE_FA_A3: ["indmoney"]}),
+        read_input(purchases=["rsu"]),
+        read_input(purchases=["sellable"]),
+    ]
+
+    sections = run.merge_read_inputs(inputs, read_inputs, "output", "calendar", 2024)
+
+    assert built_entries == [
+        (BENEFIT_HISTORY, ["espp", "rsu"]),
+        (HOLDINGS, ["sellable"]),
+    ]
+    # the entries of a mode stand where its first input does
+    fa_entries: t.List[t.Any] = list(sections[SectionType.SCHEDULE_FA_A3])
+    assert fa_entries == [
+        "espp",
+        "rsu",
+        "indmoney",
+        "sellable",
+    ]
+
+
+def test_an_input_without_purchases_builds_no_entries(built_entries):
+    sections = run.merge_read_inputs(
+        [(BENEFIT_HISTORY, "BenefitHistory.xlsx")],
+        [read_input()],
+        "output",
+        "calendar",
+        2024,
+    )
+
+    assert not built_entries
+    assert not sections
+
+
+def read_input_in_worker(
+    operation_mode: str, input_excel_file: str, *_
+) -> run.ReadInput:
+    """
+    Stands in for reading an input, telling where and when it was read, and leaving
+    a `.read` file beside it once it was. Defined at module level, so that a
+    spawned worker imports it by name
+    """
+    if os.path.basename(input_excel_file) == BROKEN_INPUT:
+        raise ValueError(f"Could not read {input_excel_file}")
+    read_at = time.time()
+    with open(f"{input_excel_file}.read", "w", encoding="utf-8"):
+        pass
+    return read_input(
+        purchases=[(operation_mode, input_excel_file, os.getpid(), read_at)]
+    )
+
+
+@pytest.fixture(name="read_in_workers")
+def fixture_read_in_workers(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(run, "__read_input", read_input_in_worker)
+    monkeypatch.setattr(pending_refresh, "pending_refreshes", {})
+
+    def read_inputs(inputs: t.List[t.Tuple[str, str]]) -> t.List[run.ReadInput]:
+        return run.read_all_inputs(inputs, "calendar", 2024, None, 2, False)
+
+    return read_inputs
+
+
+def test_inputs_read_in_workers_come_back_in_input_order(read_in_workers, tmp_path):
+    inputs = [
+        (BENEFIT_HISTORY, str(tmp_path / "BenefitHistory.xlsx")),
+        (HOLDINGS, str(tmp_path / "Sellable.csv")),
+        (GROWW_STOCKS, str(tmp_path / "Stocks_Capital_Gains_Report.xlsx")),
+    ]
+    refresh: Future[None] = Future()
+    pending_refresh.register(
+        refresh_manifest.SHARES_SOURCE,
+        "adbe",
+        pending_refresh.PendingRefresh(refresh, time.monotonic() + 60, "adbe"),
+    )
+    refreshed_at: t.List[float] = []
+
+    def finish_refresh() -> None:
+        # the refresh outlasts reading the inputs that need none of its data,
+        # which are read meanwhile
+        give_up_at = time.monotonic() + 30
+        while time.monotonic() < give_up_at and not all(
+            os.path.exists(f"{input_file}.read") for _, input_file in inputs[1:]
+        ):
+            time.sleep(0.05)
+        time.sleep(0.5)
+        refreshed_at.append(time.time())
+        refresh.set_result(None)
+
+    refresh_thread = threading.Thread(target=finish_refresh)
+    refresh_thread.start()
+
+    read_inputs = read_in_workers(inputs)
+    refresh_thread.join()
+
+    reads = [read.purchases[0] for read in read_inputs if read.purchases]
+    assert [(mode, input_file) for mode, input_file, _, _ in reads] == inputs
+    assert all(pid != os.getpid() for _, _, pid, _ in reads)
+    # the benefit history reads share prices, so it is held back until their
+    # refresh is over, unlike the rest
+    assert reads[0][3] >= refreshed_at[0]
+    assert all(read_at < refreshed_at[0] for _, _, _, read_at in reads[1:])
+
+
+def test_failure_in_a_worker_is_raised(read_in_workers, tmp_path):
+    with pytest.raises(ValueError, match=BROKEN_INPUT):
+        read_in_workers(
+            [
+                (HOLDINGS, str(tmp_path / "Sellable.csv")),
+                (GROWW_STOCKS, str(tmp_path / BROKEN_INPUT)),
+            ]
+        )
@@ -0,0 +1,155 @@
+import math
+import os
+
+import numpy as np
+import openpyxl
+import pytest
+
+from utils import date_utils
+from utils.rates import rbi_rates_utils
+from utils.rates.constants import RATES_SHEET_NAME
+
+TEST_CURRENCY_CODE = "TST"
+
+
+def ms(date_str: str) -> int:
+    return date_utils.parse_yyyy_mm_dd(date_str)["time_in_millis"]
+
+
+@pytest.fixture(autouse=True)
+def fixture_rate_table(monkeypatch: pytest.MonkeyPatch):
+    """
+    Rates for November 2022 to February 2023, January 2023 being missing
+    """
+    monkeypatch.setitem(
+        rbi_rates_utils.rate_map_cache,
+        TEST_CURRENCY_CODE,
+        rbi_rates_utils.RbiRateTable(
+            first_month_index=rbi_rates_utils.month_index(2022, 11),
+            rates=np.array([81.0, 82.0, np.nan, 83.0], dtype=np.float64),
+        ),
+    )
+
+
+def test_rate_for_prev_mon_across_the_year_end():
+    assert (
+        rbi_rates_utils.get_rate_for_prev_mon_for_time_in_ms(
+            TEST_CURRENCY_CODE, ms("2023-01-15")
+        )
+        == 82.0
+    )
+
+
+def test_rate_for_prev_mon_of_a_missing_month_raises():
+    with pytest.raises(ValueError) as error:
+        rbi_rates_utils.get_rate_for_prev_mon_for_time_in_ms(
+            TEST_CURRENCY_CODE, ms("2023-02-01")
+        )
+    assert "for month 1/2023" in str(error.value)
+
+
+def test_rate_for_prev_mon_of_a_missing_year_raises():
+    with pytest.raises(ValueError) as error:
+        rbi_rates_utils.get_rate_for_prev_mon_for_time_in_ms(
+            TEST_CURRENCY_CODE, ms("2024-03-01")
+        )
+    assert "for year 2024" in str(error.value)
+
+
+def test_rates_for_prev_mon_are_gathered_with_nan_for_missing_months():
+    rates = rbi_rates_utils.get_rates_for_prev_mon(
+        TEST_CURRENCY_CODE,
+        [
+            ms("2022-11-30"),
+            ms("2022-12-01"),
+            ms("2023-01-31"),
+            ms("2023-02-28"),
+            ms("2023-03-01"),
+            ms("2023-04-01"),
+        ],
+    )
+    assert math.isnan(rates[0])
+    assert rates[1:3].tolist() == [81.0, 82.0]
+    assert math.isnan(rates[3])
+    assert rates[4] == 83.0
+    assert math.isnan(rates[5])
+
+
+def write_workbook(path: str, rows) -> None:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.create_sheet(RATES_SHEET_NAME)
+    sheet.append(["Reference rates"])
+    sheet.append([])
+    sheet.append(["Date", "Currency Pairs", "Rate"])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def test_rate_tables_are_read_out_of_the_cache_while_it_matches_the_workbook(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+):
+    rates_path = str(tmp_path / "rates.xlsx")
+    write_workbook(
+        rates_path,
+        [
+            ["31 Jan 2023", "INR / 1 USD", 82.0],
+            ["31 Mar 2023", "INR / 1 USD", 83.0],
+            ["31 Mar 2023", "INR / 100 JPY", 61.0],
+        ],
+    )
+
+    rate_tables = rbi_rates_utils.read_rate_tables(rates_path)
+    assert os.path.exists(rbi_rates_utils.cache_path(rates_path))
+
+    def fail_to_open_workbook(*args, **kwargs):
+        raise AssertionError("the workbook is parsed although its cache matches it")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("pandas.ExcelFile", fail_to_open_workbook)
+        cached_rate_tables = rbi_rates_utils.read_rate_tables(rates_path)
+
+    assert list(cached_rate_tables) == list(rate_tables) == ["USD"]
+    usd_table = cached_rate_tables["USD"]
+    assert usd_table.first_month_index == rbi_rates_utils.month_index(2023, 1)
+    np.testing.assert_array_equal(usd_table.rates, [82.0, np.nan, 83.0])
+
+
+def test_rate_tables_are_parsed_again_once_the_workbook_changes(tmp_path):
+    rates_path = str(tmp_path / "rates.xlsx")
+    write_workbook(rates_path, [["31 Jan 2023", "INR / 1 USD", 82.0]])
+    rbi_rates_utils.read_rate_tables(rates_path)
+
+    write_workbook(
+        rates_path,
+        [["31 Jan 2023", "INR / 1 USD", 82.0], ["28 Feb 2023", "INR / 1 EUR", 88.0]],
+    )
+
+    assert sorted(rbi_rates_utils.read_rate_tables(rates_path)) == ["EUR", "USD"]
+
+
+def test_refreshing_the_cache_keeps_the_rates_already_read(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+):
+    rates_path = str(tmp_path / "rates.xlsx")
+    write_workbook(rates_path, [["31 Jan 2023", "INR / 1 USD", 82.0]])
+    monkeypatch.setattr(rbi_rates_utils, "RATES_FILE_ABS_PATH", rates_path)
+    monkeypatch.setattr(
+        rbi_rates_utils, "rate_map_cache", dict(rbi_rates_utils.rate_map_cache)
+    )
+    read_tables = rbi_rates_utils.read_rate_tables(rates_path)
+    monkeypatch.setitem(
+        rbi_rates_utils.workbook_rate_tables_cache, rates_path, read_tables
+    )
+    # a refresh finishing after the run stopped waiting on it
+    write_workbook(rates_path, [["31 Jan 2023", "INR / 1 USD", 90.0]])
+
+    rbi_rates_utils.refresh_cache(rates_path)
+
+    assert rbi_rates_utils.workbook_rate_tables_cache[rates_path] is read_tables
+    assert rbi_rates_utils.get_rate_at_month(TEST_CURRENCY_CODE, 11, 2022) == 81.0
+    assert rbi_rates_utils.get_rate_at_month("USD", 1, 2023) == 82.0
+    # the next run reads the refreshed rates out of the cache
+    np.testing.assert_array_equal(
+        rbi_rates_utils.read_rate_tables(rates_path)["USD"].rates, [90.0]
+    )
@@ -0,0 +1,28 @@
+import os
+import stat
+
+from utils import cache_utils
+
+
+def test_written_file_gets_the_mode_of_a_new_file(tmp_path):
+    path = str(tmp_path / "cache" / "data.compiled")
+
+    umask = os.umask(0o027)
+    try:
+        cache_utils.write_atomically(path, b"data")
+    finally:
+        os.umask(umask)
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    with open(path, "rb") as file:
+        assert file.read() == b"data"
+
+
+def test_overwritten_file_leaves_no_temp_file_behind(tmp_path):
+    path = tmp_path / "rates.cache.json"
+    path.write_bytes(b"old")
+
+    cache_utils.write_atomically(str(path), b"new")
+
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == [path.name]
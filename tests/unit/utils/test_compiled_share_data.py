@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from utils import cache_utils, compiled_share_data
+
+TEST_CSV = "Date,Close\n2023-10-12,10.0\n2023-10-13,11.5\n"
+
+
+@pytest.fixture(name="source_path")
+def fixture_source_path(tmp_path) -> str:
+    path = os.path.join(tmp_path, "data.csv")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(TEST_CSV)
+    return path
+
+
+def compile_source(source_path: str) -> None:
+    compiled_share_data.write(
+        source_path,
+        cache_utils.fingerprint(source_path),
+        np.array([1697068800000, 1697155200000], dtype=np.int64),
+        np.array([10.0, 11.5], dtype=np.float64),
+    )
+
+
+def test_compiled_arrays_are_read_back(source_path: str):
+    compile_source(source_path)
+    price_arrays = compiled_share_data.read(source_path)
+    assert price_arrays is not None
+    times_in_ms, closes = price_arrays
+    assert times_in_ms.tolist() == [1697068800000, 1697155200000]
+    assert closes.tolist() == [10.0, 11.5]
+
+
+def test_missing_compiled_file_is_not_read(source_path: str):
+    assert compiled_share_data.read(source_path) is None
+
+
+def test_compiled_file_of_a_changed_csv_is_not_read(source_path: str):
+    compile_source(source_path)
+    with open(source_path, "a", encoding="utf-8") as file:
+        file.write("2023-10-16,12.0\n")
+    assert compiled_share_data.read(source_path) is None
+
+
+def test_compiled_file_of_a_touched_csv_is_read(source_path: str):
+    compile_source(source_path)
+    stat = os.stat(source_path)
+    os.utime(source_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert compiled_share_data.read(source_path) is not None
+
+
+def test_corrupt_compiled_file_is_not_read(source_path: str):
+    with open(compiled_share_data.compiled_path(source_path), "wb") as file:
+        file.write(compiled_share_data.MAGIC + b"\x00")
+    assert compiled_share_data.read(source_path) is None
@@ -0,0 +1,146 @@
+import importlib.util
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from utils import excel_utils
+
+ENGINES = [
+    excel_utils.DEFAULT_ENGINE,
+    pytest.param(
+        excel_utils.FAST_ENGINE,
+        marks=pytest.mark.skipif(
+            importlib.util.find_spec(excel_utils.FAST_ENGINE_MODULE) is None,
+            reason=f"{excel_utils.FAST_ENGINE_MODULE} is not installed",
+        ),
+    ),
+]
+
+
+@pytest.fixture(name="workbook_path")
+def fixture_workbook_path(tmp_path) -> str:
+    workbook = openpyxl.Workbook()
+    summary = workbook.active
+    assert summary is not None
+    summary.title = "Summary"
+    summary.append(["Report"])
+    trades = workbook.create_sheet("Trades")
+    trades.append(["Name", "Quantity"])
+    trades.append(["ADBE", 2])
+    trades.append([None, 3])
+    path = str(tmp_path / "report.xlsx")
+    workbook.save(path)
+    return path
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_reader_parses_a_sheet_once(workbook_path, engine):
+    with excel_utils.WorkbookReader(workbook_path, engine=engine) as xl:
+        assert xl.sheet_names == ["Summary", "Trades"]
+        trades_pd = xl.parse(sheet_name="Trades", header=0)
+
+        assert trades_pd["Quantity"].tolist() == [2, 3]
+        assert xl.parse(sheet_name="Trades", header=0) is trades_pd
+        assert xl.parse(sheet_name="Trades", header=None) is not trades_pd
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_reader_keeps_only_the_columns_asked_for(workbook_path, engine):
+    with excel_utils.WorkbookReader(workbook_path, engine=engine) as xl:
+        trades_pd = xl.parse(
+            sheet_name="Trades", header=0, usecols=("Quantity", "Missing")
+        )
+
+        assert trades_pd.columns.tolist() == ["Quantity"]
+        assert trades_pd["Quantity"].tolist() == [2, 3]
+        assert xl.parse(sheet_name="Trades", header=0) is not trades_pd
+
+
+def test_reader_of_a_missing_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        excel_utils.WorkbookReader(str(tmp_path / "missing.xlsx"))
+
+
+@pytest.fixture(name="csv_path")
+def fixture_csv_path(tmp_path) -> str:
+    path = tmp_path / "Trades.csv"
+    # led by a BOM, with rows of differing widths and a blank row, as a statement
+    # stacks its blocks
+    path.write_text(
+        "\ufeffShort Term trades\nName,Quantity,Remark\nADBE,2,NA\n,3\n\nTotal,5\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_csv_reader_reads_a_sheet_named_after_the_file(csv_path):
+    with excel_utils.CsvReader(csv_path) as xl:
+        assert xl.sheet_names == ["Trades"]
+        sheet_pd = xl.parse(sheet_name="Trades", header=None)
+
+        assert excel_utils.cell_texts(sheet_pd).to_numpy().tolist() == [
+            ["Short Term trades", "", ""],
+            ["Name", "Quantity", "Remark"],
+            ["ADBE", "2", "NA"],
+            ["", "3", ""],
+            ["", "", ""],
+            ["Total", "5", ""],
+        ]
+        assert xl.parse(sheet_name="Trades", header=None) is sheet_pd
+
+
+def test_csv_reader_keeps_only_the_columns_asked_for(csv_path):
+    with excel_utils.CsvReader(csv_path) as xl:
+        trades_pd = xl.parse(
+            sheet_name="Trades", skiprows=1, header=0, usecols=("Quantity", "Missing")
+        )
+
+        assert trades_pd.columns.tolist() == ["Quantity"]
+        assert trades_pd["Quantity"].tolist()[:2] == [2, 3]
+
+
+def test_csv_reader_has_no_other_sheet(csv_path):
+    with excel_utils.CsvReader(csv_path) as xl:
+        with pytest.raises(ValueError):
+            xl.parse(sheet_name="Summary")
+
+
+def test_open_report_tells_the_readers_apart_by_extension(workbook_path, tmp_path):
+    csv_path = tmp_path / "Sellable.CSV"
+    csv_path.write_text("Symbol\nADBE\n", encoding="utf-8")
+
+    with excel_utils.open_report(str(csv_path)) as xl:
+        assert isinstance(xl, excel_utils.CsvReader)
+        assert xl.sheet_names == ["Sellable"]
+    with excel_utils.open_report(workbook_path) as xl:
+        assert isinstance(xl, excel_utils.WorkbookReader)
+
+
+def test_cell_texts_trims_every_cell_and_blanks_the_empty_ones():
+    sheet_pd = pd.DataFrame([[" Name of Stock ", None, 1.5], [float("nan"), "  ", "-"]])
+
+    texts = excel_utils.cell_texts(sheet_pd)
+
+    assert texts.to_numpy().tolist() == [["Name of Stock", "", "1.5"], ["", "", "-"]]
+
+
+def test_only_the_fast_engine_reads_binary_and_opendocument_workbooks():
+    assert excel_utils.report_file_extensions(excel_utils.DEFAULT_ENGINE) == [
+        ".csv",
+        ".xlsx",
+        ".xlsm",
+    ]
+    assert set(excel_utils.report_file_extensions(excel_utils.FAST_ENGINE)) >= {
+        ".xls",
+        ".xlsb",
+        ".ods",
+    }
+
+
+def test_reader_turns_away_a_workbook_its_engine_cannot_read(tmp_path):
+    path = tmp_path / "BenefitHistory.xls"
+    path.write_bytes(b"legacy workbook")
+
+    with pytest.raises(ValueError, match=excel_utils.FAST_ENGINE_MODULE):
+        excel_utils.WorkbookReader(str(path), engine=excel_utils.DEFAULT_ENGINE)
@@ -0,0 +1,130 @@
+import os
+import pathlib
+import typing as t
+
+import pytest
+
+# the project's own `parser` package carries the name of a stdlib module, so its
+# imports are ordered as though they were standard ones
+# pylint: disable-next=wrong-import-order
+from parser.demat.etrade import etrade_benefit_history_parser
+from models.transaction import TransactionWithTicker
+from utils import date_utils, parse_cache, refresh_manifest
+
+BOUNDS = (None, 1_700_000_000_000)
+
+
+@pytest.fixture(name="report_path")
+def fixture_report_path(tmp_path) -> str:
+    report_path = tmp_path / "report.xlsx"
+    report_path.write_bytes(b"report")
+    return str(report_path)
+
+
+@pytest.fixture(name="counting_parse")
+def fixture_counting_parse():
+    """
+    A parse returning how many times it was called so far
+    """
+    calls: t.List[int] = []
+
+    def parse() -> int:
+        calls.append(len(calls) + 1)
+        return calls[-1]
+
+    return parse
+
+
+def get_or_parse(
+    tmp_path,
+    report_path: str,
+    parse: t.Callable[[], int],
+    time_bounds_in_ms: date_utils.DateBoundsInMs = BOUNDS,
+) -> int:
+    return parse_cache.get_or_parse(
+        str(tmp_path / "cache"), "mode", report_path, time_bounds_in_ms, parse
+    )
+
+
+def test_unchanged_report_is_not_parsed_again(tmp_path, report_path, counting_parse):
+    assert get_or_parse(tmp_path, report_path, counting_parse) == 1
+    assert get_or_parse(tmp_path, report_path, counting_parse) == 1
+
+
+def test_changed_report_is_parsed_again(tmp_path, report_path, counting_parse):
+    get_or_parse(tmp_path, report_path, counting_parse)
+    with open(report_path, "wb") as file:
+        file.write(b"tweaked report")
+
+    assert get_or_parse(tmp_path, report_path, counting_parse) == 2
+
+
+def test_other_time_bounds_are_parsed_again(tmp_path, report_path, counting_parse):
+    get_or_parse(tmp_path, report_path, counting_parse)
+
+    assert get_or_parse(tmp_path, report_path, counting_parse, (None, None)) == 2
+
+
+def test_changed_dependency_is_parsed_again(tmp_path, report_path):
+    prices_path = tmp_path / "data.csv"
+    prices_path.write_text("Date,Close\n")
+    calls: t.List[int] = []
+
+    def parse() -> int:
+        parse_cache.record_dependency(
+            refresh_manifest.SHARES_SOURCE, "adbe", str(prices_path)
+        )
+        calls.append(len(calls) + 1)
+        return calls[-1]
+
+    get_or_parse(tmp_path, report_path, parse)
+    assert get_or_parse(tmp_path, report_path, parse) == 1
+    prices_path.write_text("Date,Close\n2024-01-02,500.0\n")
+
+    assert get_or_parse(tmp_path, report_path, parse) == 2
+
+
+def test_unreadable_entry_is_parsed_again(tmp_path, report_path, counting_parse):
+    get_or_parse(tmp_path, report_path, counting_parse)
+    cache_folder = tmp_path / "cache"
+    for entry_name in os.listdir(cache_folder):
+        (cache_folder / entry_name).write_bytes(b"not an entry")
+
+    assert get_or_parse(tmp_path, report_path, counting_parse) == 2
+
+
+def test_no_cache_folder_parses_every_time(report_path, counting_parse):
+    for expected_calls in (1, 2):
+        assert (
+            parse_cache.get_or_parse(None, "mode", report_path, BOUNDS, counting_parse)
+            == expected_calls
+        )
+
+
+def test_identical_csv_exports_of_other_sheets_are_parsed_apart(tmp_path):
+    # a CSV export names its only sheet after the file, so the same rows read as
+    # the ESPP sheet out of one file and as no known sheet out of the other
+    rows = (
+        "Record Type,Symbol,Purchase Date,Net Shares,Purchase Date FMV\n"
+        "Purchase,ADBE,30-JUN-2020,2,$435.31\n"
+    )
+    espp_path = tmp_path / f"{etrade_benefit_history_parser.ESPP_SHEET_NAME}.csv"
+    other_path = tmp_path / "Benefit.csv"
+    espp_path.write_text(rows, encoding="utf-8")
+    other_path.write_text(rows, encoding="utf-8")
+
+    def read_purchases(
+        path: pathlib.Path,
+    ) -> t.Optional[t.List[TransactionWithTicker]]:
+        return parse_cache.get_or_parse(
+            str(tmp_path / "cache"),
+            "etrade_benefit_history",
+            str(path),
+            BOUNDS,
+            lambda: etrade_benefit_history_parser.read_purchases(str(path), BOUNDS),
+        )
+
+    assert read_purchases(other_path) is None
+    purchases = read_purchases(espp_path)
+    assert purchases is not None
+    assert [purchase.purchase.quantity for purchase in purchases] == [2.0]
@@ -0,0 +1,86 @@
+import threading
+import time
+import typing as t
+from concurrent.futures import Future
+
+import pytest
+
+from utils import pending_refresh
+
+SOURCE = "test"
+
+
+@pytest.fixture(autouse=True)
+def fixture_pending_refreshes(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(pending_refresh, "pending_refreshes", {})
+
+
+def refresh_finishing_in(seconds: float, deadline_in_s: float = 5.0):
+    future: Future[None] = Future()
+    threading.Timer(seconds, future.set_result, args=(None,)).start()
+    return pending_refresh.PendingRefresh(
+        future=future,
+        deadline=time.monotonic() + deadline_in_s,
+        description="test data",
+    )
+
+
+def test_wait_blocks_until_the_refresh_of_the_key_is_done():
+    refresh = refresh_finishing_in(0.05)
+    pending_refresh.register(SOURCE, "ADBE", refresh)
+
+    pending_refresh.wait(SOURCE, "adbe")
+
+    assert refresh.future.done()
+    assert not pending_refresh.pending_refreshes[SOURCE]
+
+
+def test_wait_returns_at_the_deadline(capsys):
+    refresh = refresh_finishing_in(0.5, deadline_in_s=0.05)
+    pending_refresh.register(SOURCE, "adbe", refresh)
+
+    pending_refresh.wait(SOURCE, "adbe")
+
+    assert not refresh.future.done()
+    assert "did not finish in time" in capsys.readouterr().out
+
+
+def test_wait_without_a_refresh_returns_at_once():
+    pending_refresh.wait(SOURCE, "adbe")
+
+
+def test_wait_all_waits_for_a_refresh_of_many_keys_once():
+    refresh = refresh_finishing_in(0.05)
+    pending_refresh.register(SOURCE, "usd", refresh)
+    pending_refresh.register(SOURCE, "eur", refresh)
+
+    pending_refresh.wait_all(SOURCE)
+
+    assert refresh.future.done()
+    assert SOURCE not in pending_refresh.pending_refreshes
+
+
+@pytest.mark.parametrize(
+    "wait",
+    [
+        lambda: pending_refresh.wait(SOURCE, "usd"),
+        lambda: pending_refresh.wait_all(SOURCE),
+    ],
+)
+def test_every_thread_racing_a_refresh_waits_for_it(wait):
+    refresh = refresh_finishing_in(0.3)
+    pending_refresh.register(SOURCE, "usd", refresh)
+    pending_refresh.register(SOURCE, "eur", refresh)
+    done_before_returning: t.List[bool] = []
+
+    def look_up() -> None:
+        wait()
+        done_before_returning.append(refresh.future.done())
+
+    threads = [threading.Thread(target=look_up) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert done_before_returning == [True, True]
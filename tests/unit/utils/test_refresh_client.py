@@ -0,0 +1,114 @@
+import threading
+import typing as t
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils import refresh_client
+
+
+class StubServer:
+    """
+    Answers every GET with the next of the scripted statuses, recording the client
+    port of each request to tell the connections apart
+    """
+
+    def __init__(self, statuses: t.List[int]):
+        self.statuses = statuses
+        self.client_ports: t.List[int] = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                stub.client_ports.append(self.client_address[1])
+                status = stub.statuses.pop(0) if stub.statuses else 200
+                body = b'{"ok": true}'
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/rates"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(name="stub_server")
+def fixture_stub_server(monkeypatch: pytest.MonkeyPatch):
+    # a session of its own, so that no connection outlives the stub it was made to
+    monkeypatch.setattr(refresh_client, "shared_session", None)
+    servers: t.List[StubServer] = []
+
+    def start(statuses: t.List[int]) -> StubServer:
+        servers.append(StubServer(statuses))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_get_retries_transient_statuses(stub_server):
+    server = stub_server([503, 429])
+
+    response = refresh_client.get(
+        server.url, {}, refresh_client.deadline_in(10), backoff_in_s=0.01
+    )
+
+    assert response.status_code == 200
+    assert len(server.client_ports) == 3
+
+
+def test_get_reuses_the_connection_across_requests(stub_server):
+    server = stub_server([])
+
+    for _ in range(3):
+        refresh_client.get(server.url, {}, refresh_client.deadline_in(10))
+
+    assert len(set(server.client_ports)) == 1
+
+
+def test_get_returns_other_statuses_without_retrying(stub_server):
+    server = stub_server([404])
+
+    response = refresh_client.get(
+        server.url, {}, refresh_client.deadline_in(10), backoff_in_s=0.01
+    )
+
+    assert response.status_code == 404
+    assert len(server.client_ports) == 1
+
+
+def test_get_gives_up_after_the_last_attempt(stub_server):
+    server = stub_server([500] * 5)
+
+    with pytest.raises(requests.HTTPError):
+        refresh_client.get(
+            server.url,
+            {},
+            refresh_client.deadline_in(10),
+            max_attempts=2,
+            backoff_in_s=0.01,
+        )
+    assert len(server.client_ports) == 2
+
+
+def test_get_gives_up_when_a_retry_would_pass_the_deadline(stub_server):
+    server = stub_server([500] * 5)
+
+    with pytest.raises(requests.HTTPError):
+        refresh_client.get(
+            server.url, {}, refresh_client.deadline_in(0.5), backoff_in_s=1
+        )
+    assert len(server.client_ports) == 1
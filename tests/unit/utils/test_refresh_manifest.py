@@ -0,0 +1,100 @@
+import pytest
+
+from utils import date_utils, refresh_manifest
+
+HOUR_IN_MS = 60 * 60 * 1000
+
+
+def ms(date_str: str) -> int:
+    return date_utils.parse_yyyy_mm_dd(date_str)["time_in_millis"]
+
+
+@pytest.fixture(name="manifest_path")
+def fixture_manifest_path(tmp_path) -> str:
+    return str(tmp_path / "manifest.json")
+
+
+def test_unrecorded_key_is_not_fresh(manifest_path):
+    assert not refresh_manifest.is_fresh(
+        refresh_manifest.SHARES_SOURCE, "adbe", 3600, manifest_path=manifest_path
+    )
+
+
+def test_key_refreshed_within_the_ttl_is_fresh(manifest_path):
+    # Wednesday, with the stored history a day behind
+    refreshed_at_in_ms = ms("2024-01-10") + 10 * HOUR_IN_MS
+    refresh_manifest.record(
+        refresh_manifest.SHARES_SOURCE,
+        "ADBE",
+        "2024-01-09",
+        manifest_path=manifest_path,
+        now_in_ms=refreshed_at_in_ms,
+    )
+
+    def is_fresh(now_in_ms: int) -> bool:
+        return refresh_manifest.is_fresh(
+            refresh_manifest.SHARES_SOURCE,
+            "adbe",
+            3600,
+            manifest_path=manifest_path,
+            now_in_ms=now_in_ms,
+        )
+
+    assert is_fresh(refreshed_at_in_ms + HOUR_IN_MS - 1)
+    assert not is_fresh(refreshed_at_in_ms + HOUR_IN_MS)
+
+
+def test_key_covering_the_last_work_day_is_fresh_past_the_ttl(manifest_path):
+    # refreshed on Saturday, once Friday's session is over
+    refresh_manifest.record(
+        refresh_manifest.RATES_SOURCE,
+        "USD",
+        "2024-01-12",
+        manifest_path=manifest_path,
+        now_in_ms=ms("2024-01-13") + HOUR_IN_MS,
+    )
+
+    def is_fresh(now_in_ms: int) -> bool:
+        return refresh_manifest.is_fresh(
+            refresh_manifest.RATES_SOURCE,
+            "usd",
+            0,
+            manifest_path=manifest_path,
+            now_in_ms=now_in_ms,
+        )
+
+    # nothing is published over the weekend following Friday 2024-01-12
+    assert is_fresh(ms("2024-01-13") + 12 * HOUR_IN_MS)
+    assert is_fresh(ms("2024-01-14") + 12 * HOUR_IN_MS)
+    assert not is_fresh(ms("2024-01-15") + 12 * HOUR_IN_MS)
+
+
+def test_key_refreshed_intraday_is_not_fresh_for_the_rest_of_the_day(manifest_path):
+    # Wednesday morning, the history ending in the day's partial close
+    refreshed_at_in_ms = ms("2024-01-10") + 10 * HOUR_IN_MS
+    refresh_manifest.record(
+        refresh_manifest.SHARES_SOURCE,
+        "ADBE",
+        "2024-01-10",
+        manifest_path=manifest_path,
+        now_in_ms=refreshed_at_in_ms,
+    )
+
+    entry = refresh_manifest.read(manifest_path)[refresh_manifest.SHARES_SOURCE]["adbe"]
+    assert entry["last_date"] == "2024-01-09"
+    assert not refresh_manifest.is_fresh(
+        refresh_manifest.SHARES_SOURCE,
+        "adbe",
+        3600,
+        manifest_path=manifest_path,
+        now_in_ms=refreshed_at_in_ms + 10 * HOUR_IN_MS,
+    )
+
+
+def test_unreadable_manifest_reads_as_empty(manifest_path):
+    with open(manifest_path, "w", encoding="utf-8") as file:
+        file.write("{not json")
+    assert not refresh_manifest.read(manifest_path)
+    assert not refresh_manifest.is_fresh(
+        refresh_manifest.RATES_SOURCE, "usd", 3600, manifest_path=manifest_path
+    )
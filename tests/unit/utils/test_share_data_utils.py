@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+
+from utils import date_utils, share_data_utils
+from utils.rates import rbi_rates_utils
+from utils.ticker_mapping import ticker_currency_info
+
+TEST_TICKER = "test"
+TEST_CURRENCY_CODE = "USD"
+
+
+def ms(date_str: str) -> int:
+    return date_utils.parse_yyyy_mm_dd(date_str)["time_in_millis"]
+
+
+@pytest.fixture(name="price_history", autouse=True)
+def fixture_price_history(monkeypatch: pytest.MonkeyPatch):
+    """
+    A Thursday to Tuesday history, the market being closed over the weekend
+    """
+    history = share_data_utils.PriceHistory(
+        times_in_ms=np.array(
+            [ms("2023-10-12"), ms("2023-10-13"), ms("2023-10-16"), ms("2023-10-17")],
+            dtype=np.int64,
+        ),
+        closes=np.array([10.0, 11.0, 12.0, 13.0], dtype=np.float64),
+    )
+    monkeypatch.setitem(share_data_utils.price_map_cache, TEST_TICKER, history)
+    monkeypatch.setitem(ticker_currency_info, TEST_TICKER, TEST_CURRENCY_CODE)
+    monkeypatch.setattr(share_data_utils, "peak_index_cache", {})
+    monkeypatch.setattr(share_data_utils, "closing_price_cache", {})
+    return history
+
+
+@pytest.fixture(name="pre_fbil_price_history")
+def fixture_pre_fbil_price_history(monkeypatch: pytest.MonkeyPatch):
+    """
+    A history from before the reference rates start, the rates of its last days
+    being known
+    """
+    history = share_data_utils.PriceHistory(
+        times_in_ms=np.array(
+            [ms("2010-01-04"), ms("2023-10-12"), ms("2023-10-13")], dtype=np.int64
+        ),
+        closes=np.array([10.0, 11.0, 12.0], dtype=np.float64),
+    )
+    monkeypatch.setitem(share_data_utils.price_map_cache, TEST_TICKER, history)
+    return history
+
+
+def inr_price(date_str: str, close: float) -> float:
+    return close * rbi_rates_utils.get_rate_for_prev_mon_for_time_in_ms(
+        TEST_CURRENCY_CODE, ms(date_str)
+    )
+
+
+def test_fmv_on_a_trading_day_is_its_close():
+    assert share_data_utils.get_fmv(TEST_TICKER, ms("2023-10-13")) == 11.0
+
+
+def test_fmv_on_a_weekend_is_the_next_available_close():
+    assert share_data_utils.get_fmv(TEST_TICKER, ms("2023-10-14")) == 12.0
+    assert share_data_utils.get_fmv(TEST_TICKER, ms("2023-10-15")) == 12.0
+
+
+def test_fmv_before_the_history_raises():
+    with pytest.raises(ValueError):
+        share_data_utils.get_fmv(TEST_TICKER, ms("2023-10-11"))
+
+
+def test_fmv_after_the_history_raises():
+    with pytest.raises(AssertionError) as error:
+        share_data_utils.get_fmv(TEST_TICKER, ms("2023-10-18"))
+    assert "No FMV data for share ticker test" in str(error.value)
+
+
+def test_peak_price_is_the_highest_inr_price_of_the_window():
+    assert share_data_utils.get_peak_price_in_inr(
+        TEST_TICKER, ms("2023-10-12"), ms("2023-10-16")
+    ) == inr_price("2023-10-16", 12.0)
+
+
+def test_peak_price_of_a_single_day_window():
+    assert share_data_utils.get_peak_price_in_inr(
+        TEST_TICKER, ms("2023-10-13"), ms("2023-10-13")
+    ) == inr_price("2023-10-13", 11.0)
+
+
+def test_peak_price_of_a_window_without_trading_days_raises():
+    with pytest.raises(ValueError):
+        share_data_utils.get_peak_price_in_inr(
+            TEST_TICKER, ms("2023-10-14"), ms("2023-10-15")
+        )
+
+
+@pytest.mark.usefixtures("pre_fbil_price_history")
+def test_peak_price_of_a_window_without_reference_rate_raises():
+    with pytest.raises(ValueError) as error:
+        share_data_utils.get_peak_price_in_inr(
+            TEST_TICKER, ms("2010-01-01"), ms("2023-10-13")
+        )
+    assert "No rbi data for currency code USD" in str(error.value)
+
+
+@pytest.mark.usefixtures("pre_fbil_price_history")
+def test_peak_price_after_the_missing_reference_rates():
+    assert share_data_utils.get_peak_price_in_inr(
+        TEST_TICKER, ms("2023-10-12"), ms("2023-10-13")
+    ) == inr_price("2023-10-13", 12.0)
+
+
+def test_peak_prices_share_the_end_of_their_windows():
+    start_dates = ["2023-10-16", "2023-10-12", "2023-10-17"]
+    peak_prices = share_data_utils.get_peak_prices_in_inr(
+        TEST_TICKER, [ms(start_date) for start_date in start_dates], ms("2023-10-17")
+    )
+    assert peak_prices == [
+        share_data_utils.get_peak_price_in_inr(
+            TEST_TICKER, ms(start_date), ms("2023-10-17")
+        )
+        for start_date in start_dates
+    ]
+
+
+def test_peak_prices_without_start_is_empty():
+    assert not share_data_utils.get_peak_prices_in_inr(
+        TEST_TICKER, [], ms("2023-10-17")
+    )
+
+
+@pytest.mark.usefixtures("pre_fbil_price_history")
+def test_peak_prices_with_a_window_without_reference_rate_raises():
+    with pytest.raises(ValueError) as error:
+        share_data_utils.get_peak_prices_in_inr(
+            TEST_TICKER, [ms("2023-10-12"), ms("2010-01-01")], ms("2023-10-13")
+        )
+    assert "No rbi data for currency code USD" in str(error.value)
+
+
+def test_fmv_many_states_the_date_each_fmv_was_taken_from():
+    assert share_data_utils.get_fmv_many(
+        TEST_TICKER, [ms("2023-10-14"), ms("2023-10-12"), ms("2023-10-17")]
+    ) == [
+        {"entry_time_in_millis": ms("2023-10-16"), "fmv": 12.0},
+        {"entry_time_in_millis": ms("2023-10-12"), "fmv": 10.0},
+        {"entry_time_in_millis": ms("2023-10-17"), "fmv": 13.0},
+    ]
+
+
+def test_fmv_many_without_date_is_empty():
+    assert not share_data_utils.get_fmv_many(TEST_TICKER, [])
+
+
+def test_closing_price_on_a_trading_day_is_its_close():
+    assert share_data_utils.get_closing_price(TEST_TICKER, ms("2023-10-16")) == 12.0
+
+
+def test_closing_price_on_a_weekend_is_the_last_close_before_it():
+    assert share_data_utils.get_closing_price(TEST_TICKER, ms("2023-10-15")) == 11.0
+
+
+def test_closing_price_before_the_history_raises():
+    with pytest.raises(AssertionError) as error:
+        share_data_utils.get_closing_price(TEST_TICKER, ms("2023-10-11"))
+    assert "No closing price for share ticker test" in str(error.value)
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import secrets
+import typing as t
+
+# A source file as a cache derived from it last saw it. Size and modification time
+# rule a change in or out cheaply, the content hash deciding when only the
+# modification time moved, which a copy or a checkout does to an unchanged file
+Fingerprint = t.TypedDict("Fingerprint", {"size": int, "mtime_ns": int, "sha256": str})
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# beside the destination of an atomic write until it is renamed over it
+TEMP_FILE_PREFIX = ".tmp-"
+# `O_BINARY` keeps Windows from translating the line endings of the bytes written
+TEMP_FILE_FLAGS = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0)
+
+
+def content_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(path: str) -> Fingerprint:
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": content_hash(path),
+    }
+
+
+def is_current(path: str, stored: t.Any) -> bool:
+    """
+    Whether the file still is what the stored fingerprint describes. Anything that
+    does not read as a fingerprint is not current, so a cache written by an older
+    layout is rebuilt rather than trusted
+    """
+    if not isinstance(stored, dict) or set(stored) != set(Fingerprint.__annotations__):
+        return False
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size != stored["size"]:
+        return False
+    if stat.st_mtime_ns == stored["mtime_ns"]:
+        return True
+    return bool(content_hash(path) == stored["sha256"])
+
+
+def __create_temp_file(folder: str) -> t.Tuple[int, str]:
+    """
+    A new file of a name no other writer picks. Created with the mode a plain `open`
+    gives, the kernel applying the umask, where `mkstemp` leaves it to the owner
+    """
+    while True:
+        temp_path = os.path.join(folder, f"{TEMP_FILE_PREFIX}{secrets.token_hex(8)}")
+        try:
+            return os.open(temp_path, TEMP_FILE_FLAGS, 0o666), temp_path
+        except FileExistsError:
+            continue
+
+
+def write_atomically(path: str, data: bytes) -> None:
+    """
+    Writes beside the destination and renames over it, so a reader never sees a
+    half written cache
+    """
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    file_descriptor, temp_path = __create_temp_file(folder)
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
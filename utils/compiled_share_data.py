@@ -0,0 +1,116 @@
+"""
+Compiled form of a historic share price CSV, written beside it on first load so that
+a later run maps the parsed arrays straight from disk instead of parsing the CSV
+
+The file is a fixed width binary, `MAGIC`, the little endian length of a JSON header
+padded to a whole number of records, the header, then every epoch-ms date as int64
+followed by every close as float64. The header holds the fingerprint of the CSV the
+arrays were parsed from, a compiled file no longer matching its CSV being ignored
+"""
+
+import json
+import os
+import struct
+import typing as t
+
+from utils.runtime_utils import warn_missing_module
+from utils import cache_utils
+
+# `warn_missing_module` names a missing dependency before importing it fails, which
+# leaves every import below it reading as out of position and out of order
+# pylint: disable=wrong-import-position,wrong-import-order
+warn_missing_module("numpy")
+import numpy as np
+import numpy.typing as npt
+
+COMPILED_FILE_NAME = "data.compiled"
+
+# bumped whenever the layout or what is parsed out of the CSV changes
+MAGIC = b"SEFAFMV1"
+HEADER_LENGTH_FORMAT = "<Q"
+RECORD_SIZE = 8
+
+TIMES_DTYPE = np.dtype("<i8")
+CLOSES_DTYPE = np.dtype("<f8")
+
+PriceArrays = t.Tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]
+
+
+def compiled_path(source_path: str) -> str:
+    return os.path.join(os.path.dirname(source_path), COMPILED_FILE_NAME)
+
+
+def __read_header(path: str) -> t.Optional[t.Dict[str, t.Any]]:
+    try:
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                return None
+            (header_length,) = struct.unpack(
+                HEADER_LENGTH_FORMAT,
+                file.read(struct.calcsize(HEADER_LENGTH_FORMAT)),
+            )
+            header = json.loads(file.read(header_length))
+    except (OSError, ValueError, struct.error):
+        return None
+    if not isinstance(header, dict) or not isinstance(header.get("count"), int):
+        return None
+    header["length"] = header_length
+    return header
+
+
+def read(source_path: str) -> t.Optional[PriceArrays]:
+    """
+    The dates and closes compiled out of the CSV, memory mapped. None when there is
+    no compiled file or it was compiled out of a different CSV
+    """
+    path = compiled_path(source_path)
+    header = __read_header(path)
+    if header is None or not cache_utils.is_current(source_path, header.get("source")):
+        return None
+
+    count = header["count"]
+    times_offset = len(MAGIC) + struct.calcsize(HEADER_LENGTH_FORMAT) + header["length"]
+    closes_offset = times_offset + count * TIMES_DTYPE.itemsize
+    if os.path.getsize(path) != closes_offset + count * CLOSES_DTYPE.itemsize:
+        return None
+    if count == 0:
+        # an empty range cannot be mapped
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+    return (
+        np.memmap(
+            path, dtype=TIMES_DTYPE, mode="r", offset=times_offset, shape=(count,)
+        ),
+        np.memmap(
+            path, dtype=CLOSES_DTYPE, mode="r", offset=closes_offset, shape=(count,)
+        ),
+    )
+
+
+def write(
+    source_path: str,
+    source_fingerprint: cache_utils.Fingerprint,
+    times_in_ms: npt.NDArray[np.int64],
+    closes: npt.NDArray[np.float64],
+) -> str:
+    """
+    The fingerprint is the one of the CSV as it was read, taken before parsing it, so
+    that a CSV rewritten meanwhile is not mistaken for the one compiled
+    """
+    header = json.dumps(
+        {"source": source_fingerprint, "count": len(times_in_ms)}, sort_keys=True
+    ).encode("utf-8")
+    # the arrays start on a record boundary, which is what lets them be mapped
+    header += b" " * (
+        -(len(MAGIC) + struct.calcsize(HEADER_LENGTH_FORMAT) + len(header))
+        % RECORD_SIZE
+    )
+    path = compiled_path(source_path)
+    cache_utils.write_atomically(
+        path,
+        MAGIC
+        + struct.pack(HEADER_LENGTH_FORMAT, len(header))
+        + header
+        + times_in_ms.astype(TIMES_DTYPE).tobytes()
+        + closes.astype(CLOSES_DTYPE).tobytes(),
+    )
+    return path
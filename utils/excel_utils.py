@@ -1,7 +1,11 @@
+import csv
 from dataclasses import dataclass
 import enum
+import importlib.util
 from itertools import groupby
 from operator import attrgetter
+import os
+import types
 
 from utils.runtime_utils import warn_missing_module
 
@@ -9,14 +13,212 @@ from utils.runtime_utils import warn_missing_module
 # leaves every import below it reading as out of position and out of order
 # pylint: disable=wrong-import-position,wrong-import-order
 warn_missing_module("pandas")
+warn_missing_module("openpyxl")
 import pandas as pd
 import typing as t
 
 # what a report prints in a cell that carries no value
 EMPTY_CELL_MARKER = "-"
 
+# pandas reads a workbook through calamine many times faster than through openpyxl,
+# so it is used whenever it is installed
+ExcelEngine = t.Literal["calamine", "openpyxl"]
+FAST_ENGINE: ExcelEngine = "calamine"
+FAST_ENGINE_MODULE = "python_calamine"
+DEFAULT_ENGINE: ExcelEngine = "openpyxl"
 
-def assert_sheet_names(xl: pd.ExcelFile) -> t.List[str]:
+# a report exported as CSV skips unzipping and parsing the XML of a workbook, which
+# is most of what reading a large one costs
+CSV_FILE_EXTENSION = ".csv"
+# the workbooks openpyxl reads, which are XML ones only. The binary and the
+# OpenDocument ones are only read through the fast engine
+XML_WORKBOOK_FILE_EXTENSIONS = (".xlsx", ".xlsm")
+FAST_ENGINE_FILE_EXTENSIONS = (".xlsb", ".xls", ".ods")
+
+
+def preferred_engine() -> ExcelEngine:
+    if importlib.util.find_spec(FAST_ENGINE_MODULE) is not None:
+        return FAST_ENGINE
+    return DEFAULT_ENGINE
+
+
+def report_file_extensions(engine: t.Optional[ExcelEngine] = None) -> t.List[str]:
+    """
+    Every extension a report is read from through the engine, the preferred one when
+    none is given
+    """
+    extensions = [CSV_FILE_EXTENSION, *XML_WORKBOOK_FILE_EXTENSIONS]
+    if (engine or preferred_engine()) == FAST_ENGINE:
+        extensions.extend(FAST_ENGINE_FILE_EXTENSIONS)
+    return extensions
+
+
+class WorkbookReader:
+    """
+    A report opened once, every parser reading its sheets through it. A sheet is
+    only read once asked for, as a DataFrame kept for every later ask, which is
+    shared and so never to be modified
+    """
+
+    def __init__(self, path: str, engine: t.Optional[ExcelEngine] = None):
+        self.path = path
+        self.engine = engine or preferred_engine()
+        # openpyxl fails deep inside on a workbook it cannot read, so it is turned
+        # away here with what it takes to read it
+        if (
+            os.path.splitext(path)[1].lower() in FAST_ENGINE_FILE_EXTENSIONS
+            and self.engine != FAST_ENGINE
+        ):
+            raise ValueError(
+                f"{path} can only be read once {FAST_ENGINE_MODULE} is installed,"
+                ' e.g. with pip3 install ".[fast]"'
+            )
+        self.__excel_file = pd.ExcelFile(path, engine=self.engine)
+        self.__frames: t.Dict[
+            t.Tuple[str, int, t.Optional[int], t.Optional[t.FrozenSet[str]]],
+            pd.DataFrame,
+        ] = {}
+
+    def __enter__(self) -> "WorkbookReader":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: t.Optional[t.Type[BaseException]],
+        exc_value: t.Optional[BaseException],
+        traceback: t.Optional[types.TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__excel_file.close()
+
+    @property
+    def sheet_names(self) -> t.List[t.Union[int, str]]:
+        return list(self.__excel_file.sheet_names)
+
+    def parse(
+        self,
+        sheet_name: str,
+        skiprows: int = 0,
+        header: t.Optional[int] = 0,
+        usecols: t.Optional[t.Collection[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        The sheet as `pd.ExcelFile.parse` reads it, parsed on the first ask only.
+        `usecols` keeps just the columns of those header names, so that the columns a
+        parser has no use for are never converted. A name the sheet lacks is left
+        out rather than failing, leaving it to the parser whether it is needed
+        """
+        columns = None if usecols is None else frozenset(usecols)
+        key = (sheet_name, skiprows, header, columns)
+        if key not in self.__frames:
+            self.__frames[key] = self.__excel_file.parse(
+                sheet_name=sheet_name,
+                skiprows=skiprows,
+                header=header,
+                usecols=None if columns is None else columns.__contains__,
+            )
+        return self.__frames[key]
+
+
+class CsvReader:
+    """
+    A report exported as CSV, read as a workbook of a single sheet named after the
+    file, which is how a spreadsheet application opens it too. Every other cell is
+    typed by pandas a column at a time, so a column mixing text and figures is read
+    as text. Only a blank cell is missing, a report being free to print "NA" as a
+    value
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # no engine reads a CSV, the attribute only being shared with a workbook
+        self.engine: t.Optional[ExcelEngine] = None
+        self.sheet_name = os.path.splitext(os.path.basename(path))[0]
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No such file: '{path}'")
+        self.__frames: t.Dict[
+            t.Tuple[int, t.Optional[int], t.Optional[t.FrozenSet[str]]],
+            pd.DataFrame,
+        ] = {}
+
+    def __enter__(self) -> "CsvReader":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: t.Optional[t.Type[BaseException]],
+        exc_value: t.Optional[BaseException],
+        traceback: t.Optional[types.TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__frames.clear()
+
+    @property
+    def sheet_names(self) -> t.List[t.Union[int, str]]:
+        return [self.sheet_name]
+
+    def __assert_sheet_name(self, sheet_name: str) -> None:
+        if sheet_name != self.sheet_name:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+    def __rows(self) -> t.Iterator[t.List[str]]:
+        # a BOM is what a spreadsheet application leads its UTF-8 export with
+        with open(self.path, newline="", encoding="utf-8-sig") as file:
+            yield from csv.reader(file)
+
+    def parse(
+        self,
+        sheet_name: str,
+        skiprows: int = 0,
+        header: t.Optional[int] = 0,
+        usecols: t.Optional[t.Collection[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        The sheet as `WorkbookReader.parse` reads it out of a workbook
+        """
+        self.__assert_sheet_name(sheet_name)
+        columns = None if usecols is None else frozenset(usecols)
+        key = (skiprows, header, columns)
+        if key not in self.__frames:
+            # a statement stacks blocks of differing widths, which pandas only
+            # reads once told how many columns the widest row has
+            names = (
+                range(max(map(len, self.__rows()), default=0))
+                if header is None
+                else None
+            )
+            self.__frames[key] = pd.read_csv(
+                self.path,
+                encoding="utf-8-sig",
+                skiprows=skiprows,
+                header=header,
+                names=names,
+                usecols=None if columns is None else columns.__contains__,
+                keep_default_na=False,
+                na_values=[""],
+                skip_blank_lines=False,
+            )
+        return self.__frames[key]
+
+
+ReportReader = t.Union[WorkbookReader, CsvReader]
+
+
+def open_report(path: str, engine: t.Optional[ExcelEngine] = None) -> ReportReader:
+    """
+    Reader of a report of any of `report_file_extensions`, told apart by its
+    extension. `engine` only applies to a workbook
+    """
+    if os.path.splitext(path)[1].lower() == CSV_FILE_EXTENSION:
+        return CsvReader(path)
+    return WorkbookReader(path, engine)
+
+
+def assert_sheet_names(xl: ReportReader) -> t.List[str]:
     """
     Name of every sheet of a workbook, in the order the workbook holds them
 
@@ -70,6 +272,16 @@ def optional_cell_text(value: t.Any) -> str:
     return cell_text(value)
 
 
+def cell_texts(sheet_pd: pd.DataFrame) -> pd.DataFrame:
+    """
+    Trimmed text of every cell of a sheet, empty for a blank one. Converted a column
+    at a time, so that a header or a marker is located by a mask over the frame
+    rather than by reading it row by row
+    """
+    texts: pd.DataFrame = sheet_pd.astype(str).apply(lambda column: column.str.strip())
+    return texts.where(sheet_pd.notna(), "")
+
+
 def to_float(value: t.Any) -> float:
     """
     Numeric value of a spreadsheet cell. A thousands separator and the dash a report
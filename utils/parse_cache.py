@@ -0,0 +1,189 @@
+"""
+Parsed reports kept across runs, so that a run reparses only the inputs that changed
+since an earlier one read them
+
+An entry is keyed by the operation mode, the name and the content hash of the
+report, the `PARSER_VERSION` and the time bounds it was parsed within, and holds the
+parsed value pickled and zlib compressed. A parse also reads share prices and
+reference rates, whose files are recorded while it runs and stored with the entry,
+so that an entry parsed from data a refresh has since rewritten is parsed again
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import zlib
+import typing as t
+
+from . import cache_utils, date_utils, logger, pending_refresh
+
+T = t.TypeVar("T")
+
+# bumped whenever a parser reads a report differently or the models it builds
+# change shape, which retires every entry parsed before
+PARSER_VERSION = 3
+
+ENTRY_FILE_SUFFIX = ".pickle.zlib"
+
+script_path = os.path.realpath(os.path.dirname(__file__))
+DEFAULT_CACHE_FOLDER_ABS_PATH = os.path.join(script_path, os.pardir, ".cache", "parse")
+
+# a file a parse read data out of, along with the refresh that may rewrite it
+Dependency = t.TypedDict("Dependency", {"source": str, "key": str, "path": str})
+StoredDependency = t.TypedDict(
+    "StoredDependency",
+    {
+        "source": str,
+        "key": str,
+        "path": str,
+        "fingerprint": cache_utils.Fingerprint,
+    },
+)
+
+# what `__read` returns for an entry that cannot be used, a parse being free to
+# return None
+MISS = object()
+
+# the dependencies of every parse running, each recording whatever is read while
+# it runs
+dependency_recordings: t.List[t.Dict[str, Dependency]] = []
+dependency_recordings_lock = threading.Lock()
+
+
+def record_dependency(source: str, key: str, path: str) -> None:
+    """
+    Called by a lookup of data on disk, which a cached parse then depends on
+    """
+    if not dependency_recordings:
+        return
+    with dependency_recordings_lock:
+        for recording in dependency_recordings:
+            recording.setdefault(
+                os.path.realpath(path), {"source": source, "key": key, "path": path}
+            )
+
+
+def entry_key(
+    operation_mode: str,
+    input_file_abs_path: str,
+    time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
+) -> str:
+    return hashlib.sha256(
+        json.dumps(
+            [
+                operation_mode,
+                # a CSV export names its only sheet after the file, which is what
+                # tells a parser the sheet it holds
+                os.path.basename(input_file_abs_path),
+                cache_utils.content_hash(input_file_abs_path),
+                PARSER_VERSION,
+                time_bounds_in_ms,
+            ]
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def __entry_path(cache_folder_abs_path: str, key: str) -> str:
+    return os.path.join(cache_folder_abs_path, f"{key}{ENTRY_FILE_SUFFIX}")
+
+
+def __is_current(dependency: StoredDependency) -> bool:
+    # the data may still be being refreshed, which is what decides whether it is
+    # the data the entry was parsed from
+    pending_refresh.wait(dependency["source"], dependency["key"])
+    return cache_utils.is_current(dependency["path"], dependency["fingerprint"])
+
+
+def __read(entry_path: str) -> t.Any:
+    """
+    The value of an entry whose dependencies are all unchanged, `MISS` otherwise. An
+    entry that cannot be read back, written by an older layout for instance, is a
+    miss rather than a failure
+    """
+    try:
+        with open(entry_path, "rb") as file:
+            entry = pickle.loads(zlib.decompress(file.read()))
+    except FileNotFoundError:
+        return MISS
+    # unpickling reports a stale or damaged entry through whatever the classes it
+    # names raise, so every failure of the read is a miss
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        logger.log(f"Ignoring the unreadable parse cache entry {entry_path} ({err})")
+        return MISS
+    if not isinstance(entry, dict) or set(entry) != {"dependencies", "value"}:
+        return MISS
+    if not all(__is_current(dependency) for dependency in entry["dependencies"]):
+        return MISS
+    return entry["value"]
+
+
+def __write(
+    entry_path: str, value: t.Any, dependencies: t.Iterable[Dependency]
+) -> None:
+    stored_dependencies: t.List[StoredDependency] = [
+        {
+            "source": dependency["source"],
+            "key": dependency["key"],
+            "path": dependency["path"],
+            "fingerprint": cache_utils.fingerprint(dependency["path"]),
+        }
+        for dependency in dependencies
+    ]
+    cache_utils.write_atomically(
+        entry_path,
+        zlib.compress(
+            pickle.dumps(
+                {"dependencies": stored_dependencies, "value": value},
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        ),
+    )
+
+
+def get_or_parse(
+    cache_folder_abs_path: t.Optional[str],
+    operation_mode: str,
+    input_file_abs_path: str,
+    time_bounds_in_ms: t.Optional[date_utils.DateBoundsInMs],
+    parse: t.Callable[[], T],
+) -> T:
+    """
+    The value an earlier run parsed out of the same report when there is one still
+    current, the value of `parse` otherwise, which is then stored for the next run.
+    No cache folder parses every time
+    """
+    if cache_folder_abs_path is None:
+        return parse()
+
+    entry_path = __entry_path(
+        cache_folder_abs_path,
+        entry_key(operation_mode, input_file_abs_path, time_bounds_in_ms),
+    )
+    cached_value = __read(entry_path)
+    if cached_value is not MISS:
+        logger.log(
+            f"Reusing the parse of {input_file_abs_path}({operation_mode}) from"
+            " the parse cache"
+        )
+        return t.cast(T, cached_value)
+
+    recording: t.Dict[str, Dependency] = {}
+    with dependency_recordings_lock:
+        dependency_recordings.append(recording)
+    try:
+        value = parse()
+    finally:
+        with dependency_recordings_lock:
+            dependency_recordings.remove(recording)
+    try:
+        __write(entry_path, value, recording.values())
+    except OSError as err:
+        # the cache only spares the next run a parse, so a folder that cannot be
+        # written to costs time and not the run
+        logger.log(
+            f"Could not write the parse cache entry of {input_file_abs_path}"
+            f" ({err}), the next run parses it again"
+        )
+    return value
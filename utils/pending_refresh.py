@@ -0,0 +1,90 @@
+import threading
+import time
+import typing as t
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+
+from . import logger
+
+
+@dataclass(frozen=True)
+class PendingRefresh:
+    """
+    A refresh running in the background, which a lookup of the data it rewrites
+    waits on until `deadline` (time.monotonic) at most
+    """
+
+    future: Future[None]
+    deadline: float
+    description: str
+
+
+# source (shares or rates) to its keys (tickers or currencies) to their refresh. A
+# source running as one refresh for many keys is registered under each of them
+pending_refreshes: t.Dict[str, t.Dict[str, PendingRefresh]] = {}
+pending_refreshes_lock = threading.Lock()
+
+
+def register(source: str, key: str, pending_refresh: PendingRefresh) -> None:
+    with pending_refreshes_lock:
+        pending_refreshes.setdefault(source, {})[key.lower()] = pending_refresh
+
+
+def __wait_for(
+    source: str, keys: t.Iterable[str], pending_refresh: PendingRefresh
+) -> None:
+    """
+    Blocks on the refresh, which stays registered under its keys until it is over,
+    so that every lookup made meanwhile, on any thread, blocks on it as well
+    rather than reading the data while it is being rewritten
+    """
+    timed_out = False
+    try:
+        pending_refresh.future.result(
+            timeout=max(0.0, pending_refresh.deadline - time.monotonic())
+        )
+    except FutureTimeoutError:
+        timed_out = True
+    with pending_refreshes_lock:
+        source_refreshes = pending_refreshes.get(source, {})
+        dropped_keys = [
+            key for key in keys if source_refreshes.get(key) is pending_refresh
+        ]
+        for key in dropped_keys:
+            del source_refreshes[key]
+    # every waiter times out together, the one dropping the refresh telling so
+    if timed_out and dropped_keys:
+        logger.log(
+            f"Refreshing {pending_refresh.description} did not finish in time; "
+            "using bundled historic data."
+        )
+
+
+def wait(source: str, key: str) -> None:
+    """
+    Blocks until the refresh of the key, if one was started, is done or out of
+    time. A refresh handles its own failures, so whatever it left on disk is what
+    the lookup reads
+    """
+    with pending_refreshes_lock:
+        pending_refresh = pending_refreshes.get(source, {}).get(key.lower())
+    if pending_refresh is not None:
+        __wait_for(source, [key.lower()], pending_refresh)
+
+
+def wait_all(source: str) -> None:
+    """
+    Blocks on every refresh of the source, for data of many keys kept in one file
+    """
+    with pending_refreshes_lock:
+        source_refreshes = list(pending_refreshes.get(source, {}).items())
+    # a refresh registered under many keys is waited on once
+    keys_of_refresh: t.Dict[PendingRefresh, t.List[str]] = {}
+    for key, pending_refresh in source_refreshes:
+        keys_of_refresh.setdefault(pending_refresh, []).append(key)
+    for pending_refresh, keys in keys_of_refresh.items():
+        __wait_for(source, keys, pending_refresh)
+    with pending_refreshes_lock:
+        if not pending_refreshes.get(source, True):
+            del pending_refreshes[source]
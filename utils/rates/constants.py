@@ -6,3 +6,7 @@ RATES_FILE_ABS_PATH = os.path.join(
     script_path, os.pardir, os.pardir, "historic_data", "rates", "rbi", "rates.xlsx"
 )
 RATES_SHEET_NAME = "Reference Rates"
+
+# The rates of every currency compiled out of the workbook, beside it. A run reads
+# this instead of opening the workbook while it still matches it
+RATES_CACHE_FILE_NAME = "rates.cache.json"
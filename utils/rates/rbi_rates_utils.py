@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import json
 import os
 from utils.runtime_utils import warn_missing_module
 
@@ -6,78 +7,279 @@ from utils.runtime_utils import warn_missing_module
 # leaves every import below it reading as out of position and out of order
 # pylint: disable=wrong-import-position,wrong-import-order
 warn_missing_module("pandas")
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
-from datetime import datetime
 import typing as t
 
-from .. import date_utils, logger
-from .constants import RATES_FILE_ABS_PATH, RATES_SHEET_NAME
+from .. import (
+    cache_utils,
+    excel_utils,
+    logger,
+    parse_cache,
+    pending_refresh,
+    refresh_manifest,
+)
+from .constants import RATES_CACHE_FILE_NAME, RATES_FILE_ABS_PATH, RATES_SHEET_NAME
 
+# a pair is stated as the INR value of one unit of the currency, which is the only
+# form a rate is read in
+CURRENCY_PAIR_PATTERN = r"^INR / 1 ([A-Z]+)$"
 
-@dataclass
-class RbiRateObj:
-    time_in_millis: int
-    rate: float
 
+@dataclass(frozen=True)
+class RbiRateTable:
+    """
+    Month end reference rates of a currency, one slot per month from the first month
+    holding a rate to the last. A month is indexed as `year * 12 + month - 1`, so a
+    rate is read by an array index instead of a nested lookup, and a month without a
+    rate holds NaN
+    """
 
-RbiYearMonthRateMap = t.Dict[int, t.Dict[int, RbiRateObj]]
-RbiCurrencyToRateMap = t.Dict[str, RbiYearMonthRateMap]
+    first_month_index: int
+    rates: npt.NDArray[np.float64]
 
-rate_map_cache: RbiCurrencyToRateMap = {}
+    def rate_at(self, index: int) -> float:
+        table_index = index - self.first_month_index
+        if table_index < 0 or table_index >= len(self.rates):
+            return float("nan")
+        return float(self.rates[table_index])
 
 
-def __init_map(currency_code: str) -> RbiYearMonthRateMap:
+RbiCurrencyToRateTable = t.Dict[str, RbiRateTable]
+
+rate_map_cache: RbiCurrencyToRateTable = {}
+# every currency of a workbook, keyed by its path, so that the workbook is read once
+# whichever currency is asked for first
+workbook_rate_tables_cache: t.Dict[str, RbiCurrencyToRateTable] = {}
+
+
+def month_index(year: int, month: int) -> int:
+    return year * 12 + month - 1
+
+
+def month_indices(times_in_ms: npt.ArrayLike) -> npt.NDArray[np.int64]:
+    """
+    `month_index` of every time at once. A datetime64 truncated to months counts
+    them from 1970-01
+    """
+    months_since_epoch = (
+        np.asarray(times_in_ms, dtype=np.int64)
+        .astype("datetime64[ms]")
+        .astype("datetime64[M]")
+        .astype(np.int64)
+    )
+    return months_since_epoch + month_index(1970, 1)
+
+
+def __build_table(
+    rate_month_indices: npt.NDArray[np.int64], rates: npt.NDArray[np.float64]
+) -> RbiRateTable:
+    if len(rate_month_indices) == 0:
+        return RbiRateTable(first_month_index=0, rates=np.empty(0, dtype=np.float64))
+    first_month_index = int(rate_month_indices.min())
+    table = np.full(
+        int(rate_month_indices.max()) - first_month_index + 1, np.nan, dtype=np.float64
+    )
+    table[rate_month_indices - first_month_index] = rates
+    return RbiRateTable(first_month_index=first_month_index, rates=table)
+
+
+def __parse_rate_tables(rates_path: str) -> RbiCurrencyToRateTable:
+    """
+    Every currency pair of the workbook, partitioned in one pass over the sheet. A
+    month keeps the rate of its latest date, which is its month end rate
+    """
+    print(f"Parsing rbi rates for every currency pair in {rates_path}")
+    with excel_utils.WorkbookReader(rates_path) as xl:
+        logger.debug_log(f"Currently parsing {RATES_SHEET_NAME} sheet")
+        sheet_pd = xl.parse(sheet_name=RATES_SHEET_NAME, skiprows=0, header=2)
+
+    currency_codes = (
+        sheet_pd["Currency Pairs"].astype(str).str.extract(CURRENCY_PAIR_PATTERN)[0]
+    )
+    rates_pd = pd.DataFrame(
+        {
+            "currency_code": currency_codes,
+            "date": sheet_pd["Date"],
+            "rate": sheet_pd["Rate"],
+        }
+    )[currency_codes.notna()]
+    rates_pd["time_in_ms"] = (
+        pd.to_datetime(rates_pd["date"], format="%d %b %Y")
+        .to_numpy(dtype="datetime64[ms]")
+        .astype(np.int64)
+    )
+    rates_pd["month_index"] = month_indices(rates_pd["time_in_ms"].to_numpy())
+    # the latest date of the month, and the first row of a date the sheet states twice
+    month_end_rates_pd = rates_pd.loc[
+        rates_pd.groupby(["currency_code", "month_index"])["time_in_ms"].idxmax()
+    ]
+
+    return {
+        str(currency_code): __build_table(
+            currency_rates_pd["month_index"].to_numpy(dtype=np.int64),
+            currency_rates_pd["rate"].to_numpy(dtype=np.float64),
+        )
+        for currency_code, currency_rates_pd in month_end_rates_pd.groupby(
+            "currency_code"
+        )
+    }
+
+
+def cache_path(rates_path: str) -> str:
+    return os.path.join(os.path.dirname(rates_path), RATES_CACHE_FILE_NAME)
+
+
+def __read_cache(rates_path: str) -> t.Optional[RbiCurrencyToRateTable]:
+    """
+    The tables compiled out of the workbook, None when there is no cache or it was
+    compiled out of a different workbook
+    """
+    try:
+        with open(cache_path(rates_path), "r", encoding="utf-8") as file:
+            cache = json.load(file)
+        if not cache_utils.is_current(rates_path, cache["source"]):
+            return None
+        return {
+            currency_code: RbiRateTable(
+                first_month_index=int(table["first_month_index"]),
+                # JSON has no NaN, so a month without a rate is stored as null
+                rates=np.array(
+                    [np.nan if rate is None else rate for rate in table["rates"]],
+                    dtype=np.float64,
+                ),
+            )
+            for currency_code, table in cache["currencies"].items()
+        }
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def __write_cache(
+    rates_path: str,
+    source_fingerprint: cache_utils.Fingerprint,
+    rate_tables: RbiCurrencyToRateTable,
+) -> str:
+    path = cache_path(rates_path)
+    cache_utils.write_atomically(
+        path,
+        json.dumps(
+            {
+                "source": source_fingerprint,
+                "currencies": {
+                    currency_code: {
+                        "first_month_index": table.first_month_index,
+                        "rates": [
+                            None if np.isnan(rate) else rate
+                            for rate in table.rates.tolist()
+                        ],
+                    }
+                    for currency_code, table in rate_tables.items()
+                },
+            },
+            indent=2,
+            sort_keys=True,
+        ).encode("utf-8"),
+    )
+    return path
+
+
+def refresh_cache(rates_path: str = RATES_FILE_ABS_PATH) -> str:
+    """
+    Compiles the workbook into its cache again, the tables already read being left
+    as they are. Called by whatever rewrites the workbook, which may be a refresh
+    finishing after the run stopped waiting on it, while the run has to convert
+    with one set of rates throughout
+    """
+    source_fingerprint = cache_utils.fingerprint(rates_path)
+    return __write_cache(
+        rates_path, source_fingerprint, __parse_rate_tables(rates_path)
+    )
+
+
+def read_rate_tables(rates_path: str = RATES_FILE_ABS_PATH) -> RbiCurrencyToRateTable:
+    """
+    The rates of every currency of the workbook, out of its cache when the cache
+    still matches it and out of the workbook itself otherwise, which compiles the
+    cache for the next run
+    """
+    if not os.path.exists(rates_path):
+        raise AssertionError(f"RBI rates {rates_path} is NOT present")
+
+    rate_tables = __read_cache(rates_path)
+    if rate_tables is not None:
+        return rate_tables
+
+    source_fingerprint = cache_utils.fingerprint(rates_path)
+    rate_tables = __parse_rate_tables(rates_path)
+    try:
+        __write_cache(rates_path, source_fingerprint, rate_tables)
+    except OSError as err:
+        # the cache only spares the next run the workbook, so a folder that cannot
+        # be written to costs time and not the lookup
+        logger.log(
+            f"Could not write the rbi rates cache ({err}), the next run parses "
+            f"{rates_path} again"
+        )
+    return rate_tables
+
+
+def __init_map(currency_code: str) -> RbiRateTable:
+    parse_cache.record_dependency(
+        refresh_manifest.RATES_SOURCE, currency_code, RATES_FILE_ABS_PATH
+    )
     if currency_code not in rate_map_cache:
-        print(f"Parsing rbi rate for currency code = {currency_code}")
-        currency_rate_map: RbiYearMonthRateMap = {}
-        if not os.path.exists(RATES_FILE_ABS_PATH):
-            raise AssertionError(f"RBI rates {RATES_FILE_ABS_PATH} is NOT present")
-
-        with pd.ExcelFile(RATES_FILE_ABS_PATH, engine="openpyxl") as xl:
-            logger.debug_log(f"Currently parsing {RATES_SHEET_NAME} sheet")
-            sheet_pd = xl.parse(sheet_name=RATES_SHEET_NAME, skiprows=0, header=2)
-            for _, data in sheet_pd.iterrows():
-                if data["Currency Pairs"] == f"INR / 1 {currency_code.upper()}":
-                    rate_time = datetime.strptime(data["Date"], "%d %b %Y")
-                    if (
-                        rate_time.year not in currency_rate_map
-                        or rate_time.month not in currency_rate_map[rate_time.year]
-                        or currency_rate_map[rate_time.year][
-                            rate_time.month
-                        ].time_in_millis
-                        < date_utils.epoch_in_ms(rate_time)
-                    ):
-                        currency_rate_map[rate_time.year] = currency_rate_map.get(
-                            rate_time.year, {}
-                        )
-                        currency_rate_map[rate_time.year][rate_time.month] = RbiRateObj(
-                            time_in_millis=date_utils.epoch_in_ms(rate_time),
-                            rate=data["Rate"],
-                        )
-
-            rate_map_cache[currency_code] = currency_rate_map
+        if RATES_FILE_ABS_PATH not in workbook_rate_tables_cache:
+            # every currency lives in the one workbook, so a lookup waits for the
+            # refresh of all of them
+            pending_refresh.wait_all(refresh_manifest.RATES_SOURCE)
+            workbook_rate_tables_cache[RATES_FILE_ABS_PATH] = read_rate_tables()
+        # a currency the workbook holds no pair of has no rate for any month
+        rate_map_cache[currency_code] = workbook_rate_tables_cache[
+            RATES_FILE_ABS_PATH
+        ].get(
+            currency_code.upper(),
+            __build_table(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)),
+        )
 
     return rate_map_cache[currency_code]
 
 
 def get_rate_at_month(currency_code: str, month: int, year: int) -> float:
-    rbi_year_month_rate_map = __init_map(currency_code)
-    if year not in rbi_year_month_rate_map:
-        raise ValueError(
-            f"No rbi data for currency code {currency_code} in {RATES_FILE_ABS_PATH} for year {year}"
-        )
-    rbi_month_rate_map = rbi_year_month_rate_map[year]
-    if month not in rbi_month_rate_map:
+    rate_table = __init_map(currency_code)
+    rate = rate_table.rate_at(month_index(year, month))
+    if np.isnan(rate):
+        if all(
+            np.isnan(rate_table.rate_at(month_index(year, year_month)))
+            for year_month in range(1, 13)
+        ):
+            raise ValueError(
+                f"No rbi data for currency code {currency_code} in {RATES_FILE_ABS_PATH} for year {year}"
+            )
         raise ValueError(
             f"No rbi data for currency code {currency_code} in {RATES_FILE_ABS_PATH} \
 for month {month}/{year}"
         )
-    return rbi_month_rate_map[month].rate
+    return rate
 
 
 def get_rate_for_prev_mon_for_time_in_ms(currency_code: str, time_in_ms: int) -> float:
-    dt = datetime.utcfromtimestamp(time_in_ms / 1000)
-    month = dt.month
-    year = dt.year
-    rate_month, rate_year = (month - 1, year) if month != 1 else (12, year - 1)
-    return get_rate_at_month(currency_code, rate_month, rate_year)
+    rate_year, rate_month = divmod(int(month_indices([time_in_ms])[0]) - 1, 12)
+    return get_rate_at_month(currency_code, rate_month + 1, rate_year)
+
+
+def get_rates_for_prev_mon(
+    currency_code: str, times_in_ms: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    """
+    Rate of the month preceding each time, gathered out of the table in one step. A
+    month without a rate comes back as NaN instead of failing, leaving it to the
+    caller whether that month is ever needed
+    """
+    rate_table = __init_map(currency_code)
+    table_indices = month_indices(times_in_ms) - 1 - rate_table.first_month_index
+    in_table = (table_indices >= 0) & (table_indices < len(rate_table.rates))
+    rates = np.full(len(table_indices), np.nan, dtype=np.float64)
+    rates[in_table] = rate_table.rates[table_indices[in_table]]
+    return rates
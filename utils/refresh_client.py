@@ -0,0 +1,142 @@
+import threading
+import time
+import typing as t
+
+from . import logger
+from .runtime_utils import warn_missing_module
+
+if t.TYPE_CHECKING:
+    # requests is only imported once a refresh reaches the network, so importing the
+    # refresh scripts (e.g. from run.py) does not require it
+    import requests
+
+T = t.TypeVar("T")
+
+# statuses a server answers with while it is briefly unable to, which a later
+# attempt may not get
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BACKOFF_IN_S = 0.5
+MAX_BACKOFF_IN_S = 8.0
+DEFAULT_DEADLINE_IN_S = 120.0
+REQUEST_TIMEOUT_IN_S = 60.0
+# a refresh fetches from a couple of hosts at most, from one thread per source
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 8
+
+# created on the first fetch and rebound then, so it is not a constant
+shared_session: t.Optional["requests.Session"] = None  # pylint: disable=invalid-name
+session_lock = threading.Lock()
+
+
+class TransientError(Exception):
+    """
+    A failure that a later attempt may not run into, raised by a call handed to
+    `call_with_retries` to ask for another attempt
+    """
+
+
+def session() -> "requests.Session":
+    """
+    The session every refresh fetches through, so that the requests to a host reuse
+    its kept alive connections
+    """
+    global shared_session  # pylint: disable=global-statement
+    with session_lock:
+        if shared_session is None:
+            warn_missing_module("requests")
+            # pylint: disable-next=import-outside-toplevel
+            import requests
+
+            # pylint: disable-next=import-outside-toplevel
+            from requests.adapters import HTTPAdapter
+
+            adapter = HTTPAdapter(
+                pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE
+            )
+            new_session = requests.Session()
+            new_session.mount("https://", adapter)
+            new_session.mount("http://", adapter)
+            shared_session = new_session
+        return shared_session
+
+
+def deadline_in(seconds: float) -> float:
+    """
+    The time.monotonic at which `seconds` from now are over
+    """
+    return time.monotonic() + seconds
+
+
+def __is_transient(err: Exception) -> bool:
+    if isinstance(err, TransientError):
+        return True
+    # pylint: disable-next=import-outside-toplevel
+    import requests
+
+    if isinstance(err, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return (
+        isinstance(err, requests.HTTPError)
+        and err.response is not None
+        and err.response.status_code in RETRY_STATUS_CODES
+    )
+
+
+def call_with_retries(
+    description: str,
+    call: t.Callable[[], T],
+    deadline: float,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    backoff_in_s: float = DEFAULT_BACKOFF_IN_S,
+) -> T:
+    """
+    Calls until an attempt succeeds, backing off exponentially between attempts
+    that failed transiently. Any other failure, the last attempt's, or one leaving
+    no time for another attempt before the deadline is raised
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return call()
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            delay_in_s = min(MAX_BACKOFF_IN_S, backoff_in_s * 2 ** (attempt - 1))
+            if (
+                attempt == max_attempts
+                or not __is_transient(err)
+                or time.monotonic() + delay_in_s >= deadline
+            ):
+                raise
+            logger.log(
+                f"Fetching {description} failed ({err}), attempt {attempt} of "
+                f"{max_attempts}; retrying in {delay_in_s}s"
+            )
+            time.sleep(delay_in_s)
+    raise AssertionError(f"max_attempts = {max_attempts} must be at least 1")
+
+
+def get(
+    url: str,
+    params: t.Mapping[str, str],
+    deadline: float,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    backoff_in_s: float = DEFAULT_BACKOFF_IN_S,
+) -> "requests.Response":
+    """
+    GETs through the shared session, retrying connection failures, timeouts and
+    the statuses of `RETRY_STATUS_CODES`. A response of any other status is
+    returned as is
+    """
+
+    def attempt() -> "requests.Response":
+        response = session().get(
+            url,
+            params=params,
+            timeout=max(0.001, min(REQUEST_TIMEOUT_IN_S, deadline - time.monotonic())),
+        )
+        if response.status_code in RETRY_STATUS_CODES:
+            response.raise_for_status()
+        return response
+
+    return call_with_retries(
+        url, attempt, deadline, max_attempts=max_attempts, backoff_in_s=backoff_in_s
+    )
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+import typing as t
+
+from . import cache_utils, date_utils
+
+# When each source of historic data was last refreshed and the last day it covers,
+# beside the data. It is local state of a checkout, so it is never committed
+script_path = os.path.realpath(os.path.dirname(__file__))
+MANIFEST_FILE_ABS_PATH = os.path.join(
+    script_path, os.pardir, "historic_data", "refresh_manifest.json"
+)
+
+SHARES_SOURCE = "shares"
+RATES_SOURCE = "rates"
+DEFAULT_TTL_IN_S = 6 * 60 * 60
+
+RefreshEntry = t.TypedDict(
+    "RefreshEntry", {"refreshed_at_in_ms": int, "last_date": str}
+)
+# source (shares or rates) to its keys (tickers or currencies) to their entry
+Manifest = t.Dict[str, t.Dict[str, RefreshEntry]]
+
+# the sources are refreshed on threads of their own, each recording itself
+manifest_lock = threading.Lock()
+
+
+DAY_IN_MS = 24 * 60 * 60 * 1000
+
+
+def __now_in_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def __last_completed_session(now_in_ms: int) -> str:
+    """
+    The last working day that is over (YYYY-MM-DD). The day of `now_in_ms` may
+    still be trading, so what was fetched of it may be a partial close
+    """
+    return date_utils.format_time(
+        date_utils.last_work_day_in_ms(now_in_ms - DAY_IN_MS), "%Y-%m-%d"
+    )
+
+
+def read(manifest_path: t.Optional[str] = None) -> Manifest:
+    """
+    The manifest, empty when there is none or it cannot be read, which only costs a
+    refresh
+    """
+    try:
+        with open(
+            manifest_path or MANIFEST_FILE_ABS_PATH, "r", encoding="utf-8"
+        ) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def record(
+    source: str,
+    key: str,
+    last_date: str,
+    manifest_path: t.Optional[str] = None,
+    now_in_ms: t.Optional[int] = None,
+) -> None:
+    """
+    Records a successful refresh of the key, covering days up to `last_date`
+    (YYYY-MM-DD) but no further than the last completed session, so that a refresh
+    catching today's partial close does not count as covering today
+    """
+    path = manifest_path or MANIFEST_FILE_ABS_PATH
+    now_in_ms = __now_in_ms() if now_in_ms is None else now_in_ms
+    with manifest_lock:
+        manifest = read(path)
+        manifest.setdefault(source, {})[key.lower()] = {
+            "refreshed_at_in_ms": now_in_ms,
+            "last_date": min(last_date, __last_completed_session(now_in_ms)),
+        }
+        cache_utils.write_atomically(
+            path, json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+        )
+
+
+def is_fresh(
+    source: str,
+    key: str,
+    ttl_in_s: float,
+    manifest_path: t.Optional[str] = None,
+    now_in_ms: t.Optional[int] = None,
+) -> bool:
+    """
+    Whether refreshing the key can be skipped: it was refreshed within the TTL, or
+    it already covers the last working day, after which nothing new is published
+    until the next one. Holidays are not known, so past the TTL a holiday costs a
+    refresh finding nothing
+    """
+    entry = read(manifest_path).get(source, {}).get(key.lower())
+    if not isinstance(entry, dict):
+        return False
+    now_in_ms = __now_in_ms() if now_in_ms is None else now_in_ms
+    try:
+        if now_in_ms - int(entry["refreshed_at_in_ms"]) < ttl_in_s * 1000:
+            return True
+        last_work_day = date_utils.format_time(
+            date_utils.last_work_day_in_ms(now_in_ms), "%Y-%m-%d"
+        )
+        return str(entry["last_date"]) >= last_work_day
+    except (KeyError, TypeError, ValueError):
+        return False
@@ -4,11 +4,22 @@ from utils.runtime_utils import warn_missing_module
 # leaves every import below it reading as out of position and out of order
 # pylint: disable=wrong-import-position,wrong-import-order
 warn_missing_module("pandas")
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 import os
 import typing as t
-
-from . import date_utils, logger
+from dataclasses import dataclass
+
+from . import (
+    cache_utils,
+    compiled_share_data,
+    date_utils,
+    logger,
+    parse_cache,
+    pending_refresh,
+    refresh_manifest,
+)
 from .ticker_mapping import ticker_currency_info
 from .rates import rbi_rates_utils
 
@@ -48,139 +59,307 @@ def __validate_dates(
 TimedFmv = t.TypedDict("TimedFmv", {"entry_time_in_millis": int, "fmv": float})
 
 
-TimedFmvWithInrRate = t.TypedDict(
-    "TimedFmvWithInrRate",
-    {
-        "entry_time_in_millis": int,
-        "fmv": float,
-        "inr_rate": float,
-    },
-)
+@dataclass(frozen=True)
+class PriceHistory:
+    """
+    Closing prices of a ticker as two parallel arrays sorted by date, so that a date
+    is found by a binary search rather than a walk over the whole history
+    """
+
+    times_in_ms: npt.NDArray[np.int64]
+    closes: npt.NDArray[np.float64]
+
+
+price_map_cache: t.Dict[str, PriceHistory] = {}
+
+
+@dataclass(frozen=True)
+class InrPeakIndex:
+    """
+    Closes of a ticker converted to INR at the reference rate of the month preceding
+    each trading day, indexed so that the peak of any window is found in constant
+    time. A day whose month has no reference rate carries NaN, and a window holding
+    one fails the same way the rate lookup does
+    """
+
+    inr_rates: npt.NDArray[np.float64]
+    inr_prices: npt.NDArray[np.float64]
+    # number of days lacking a rate before each index, so that a window is checked
+    # for one by a subtraction
+    missing_rate_counts: npt.NDArray[np.int64]
+    # sparse table, `levels[k][i]` being the day holding the peak of the 2^k days
+    # starting at day i. A tie goes to the later day
+    levels: t.List[npt.NDArray[np.int64]]
 
 
-price_map_cache: t.Dict[str, t.List[TimedFmv]] = {}
+peak_index_cache: t.Dict[str, InrPeakIndex] = {}
 
+# every schedule FA entry of a ticker closes on the same day
+closing_price_cache: t.Dict[t.Tuple[str, int], float] = {}
 
-def __init_map(ticker: str) -> t.List[TimedFmv]:
+
+def __parse_csv(historic_share_path: str) -> compiled_share_data.PriceArrays:
+    """
+    Both columns are converted whole, the dates going from `%Y-%m-%d` text to
+    datetime64 and on to epoch milliseconds without a per row parse
+    """
+    df = pd.read_csv(
+        historic_share_path,
+        usecols=["Date", "Close"],
+        dtype={"Date": str, "Close": np.float64},
+    )
+    times_in_ms = (
+        pd.to_datetime(df["Date"], format="%Y-%m-%d")
+        .to_numpy(dtype="datetime64[ms]")
+        .astype(np.int64)
+    )
+    closes = df["Close"].to_numpy(dtype=np.float64)
+
+    # the lookups bisect the dates, which only holds for a sorted history. A stable
+    # sort keeps the file order of a date stated twice
+    order = np.argsort(times_in_ms, kind="stable")
+    return (times_in_ms[order], closes[order])
+
+
+def __historic_share_path(ticker: str) -> str:
+    script_path = os.path.realpath(os.path.dirname(__file__))
+    return os.path.join(
+        script_path,
+        os.pardir,
+        "historic_data",
+        "shares",
+        ticker.lower(),
+        "data.csv",
+    )
+
+
+def __init_map(ticker: str) -> PriceHistory:
+    historic_share_path = __historic_share_path(ticker)
+    parse_cache.record_dependency(
+        refresh_manifest.SHARES_SOURCE, ticker, historic_share_path
+    )
     if ticker not in price_map_cache:
+        # the refresh of the ticker may still be rewriting its history, which only
+        # this ticker has to wait for
+        pending_refresh.wait(refresh_manifest.SHARES_SOURCE, ticker)
         print(f"Parsing FMV price map for ticker = {ticker}")
-        ticker_price_map: t.List[TimedFmv] = []
-        script_path = os.path.realpath(os.path.dirname(__file__))
-        historic_share_path = os.path.join(
-            script_path,
-            os.pardir,
-            "historic_data",
-            "shares",
-            ticker.lower(),
-            "data.csv",
-        )
         if not os.path.exists(historic_share_path):
             raise AssertionError(
                 f"Historic share data for share {ticker} NOT present at {historic_share_path}"
             )
-        df = pd.read_csv(historic_share_path)
-
-        for _, data in df.iterrows():
-            entry_time_in_ms = date_utils.parse_yyyy_mm_dd(data["Date"])[
-                "time_in_millis"
-            ]
-            ticker_price_map.append(
-                {"entry_time_in_millis": entry_time_in_ms, "fmv": data["Close"]}
-            )
 
-        price_map_cache[ticker] = ticker_price_map
+        price_arrays = compiled_share_data.read(historic_share_path)
+        if price_arrays is None:
+            source_fingerprint = cache_utils.fingerprint(historic_share_path)
+            price_arrays = __parse_csv(historic_share_path)
+            try:
+                compiled_share_data.write(
+                    historic_share_path, source_fingerprint, *price_arrays
+                )
+            except OSError as err:
+                # the compiled file only spares the next run a parse, so a folder
+                # that cannot be written to costs time and not the lookup
+                logger.log(
+                    f"Could not write the compiled price map for ticker = {ticker}"
+                    + f" ({err}), the next run parses {historic_share_path} again"
+                )
+
+        times_in_ms, closes = price_arrays
+        price_map_cache[ticker] = PriceHistory(times_in_ms=times_in_ms, closes=closes)
 
     return price_map_cache[ticker]
 
 
-def get_fmv(ticker: str, purchase_time_in_ms: int) -> float:
-    logger.debug_log(
-        f"{ticker}: Querying FMV at {date_utils.display_time(purchase_time_in_ms)}"
-    )
+def get_fmv_many(
+    ticker: str, purchase_times_in_ms: t.Sequence[int]
+) -> t.List[TimedFmv]:
+    """
+    FMV on each purchase date along with the date it was taken from, which is the
+    next available one when the market was closed on the purchase date. Every date
+    is located by one search over the price history
+    """
+    history = __init_map(ticker)
+    # first entry on or after each purchase date
+    indices: t.List[int] = np.searchsorted(
+        history.times_in_ms,
+        np.asarray(purchase_times_in_ms, dtype=np.int64),
+        side="left",
+    ).tolist()
+
+    timed_fmvs: t.List[TimedFmv] = []
+    for purchase_time_in_ms, index in zip(purchase_times_in_ms, indices):
+        logger.debug_log(
+            f"{ticker}: Querying FMV at {date_utils.display_time(purchase_time_in_ms)}"
+        )
+        if index == len(history.times_in_ms):
+            ticker_share_price = os.path.join(
+                "historic_data", "shares", ticker, "data.csv"
+            )
+            raise AssertionError(
+                f"No FMV data for share ticker {ticker} in {ticker_share_price} for date "
+                + f"{date_utils.log_timestamp(purchase_time_in_ms)}"
+            )
 
-    previous_entry_data: t.Optional[TimedFmv] = None
-    for entry_data in __init_map(ticker):
-        entry_time_in_ms = entry_data["entry_time_in_millis"]
-        if entry_time_in_ms >= purchase_time_in_ms:
-            if entry_time_in_ms > purchase_time_in_ms:
-                if previous_entry_data is None:
-                    raise ValueError("previous_entry_data is None, expected TimedFmv")
-                # the raise above rules None out, but the name is also assigned in
-                # the loop, so pylint keeps None among its values whatever guards it
-                # pylint: disable-next=unsubscriptable-object
-                previous_entry_time_in_ms = previous_entry_data["entry_time_in_millis"]
-                __validate_dates(
-                    previous_entry_time_in_ms, purchase_time_in_ms, entry_time_in_ms
+        entry_time_in_ms = int(history.times_in_ms[index])
+        if entry_time_in_ms > purchase_time_in_ms:
+            if index == 0:
+                raise ValueError(
+                    f"No FMV data for share ticker {ticker} before "
+                    + f"{date_utils.log_timestamp(purchase_time_in_ms)}, the history "
+                    + f"starting on {date_utils.log_timestamp(entry_time_in_ms)}"
                 )
-                return entry_data["fmv"]
-            return entry_data["fmv"]
-
-        previous_entry_data = entry_data
-    ticker_share_price = os.path.join("historic_data", "shares", ticker, "data.csv")
-    raise AssertionError(
-        f"No FMV data for share ticker {ticker} in {ticker_share_price} for date "
-        + f"{date_utils.log_timestamp(purchase_time_in_ms)}"
-    )
+            __validate_dates(
+                int(history.times_in_ms[index - 1]),
+                purchase_time_in_ms,
+                entry_time_in_ms,
+            )
+        timed_fmvs.append(
+            {
+                "entry_time_in_millis": entry_time_in_ms,
+                "fmv": float(history.closes[index]),
+            }
+        )
+    return timed_fmvs
+
+
+def get_fmv(ticker: str, purchase_time_in_ms: int) -> float:
+    """
+    FMV on the purchase date, or the next available one when the market was closed
+    on it
+    """
+    return get_fmv_many(ticker, [purchase_time_in_ms])[0]["fmv"]
 
 
 def get_closing_price(ticker: str, end_time_in_ms: int) -> float:
-    price_map = list(
-        filter(
-            lambda price: price["entry_time_in_millis"] <= end_time_in_ms,
-            sorted(
-                __init_map(ticker),
-                key=lambda price: price["entry_time_in_millis"],
-                reverse=True,
-            ),
+    """
+    Close of the last trading day on or before the end time
+    """
+    if (ticker, end_time_in_ms) not in closing_price_cache:
+        history = __init_map(ticker)
+        last_day = (
+            int(np.searchsorted(history.times_in_ms, end_time_in_ms, side="right")) - 1
         )
-    )
+        if last_day < 0:
+            ticker_share_price = os.path.join(
+                "historic_data", "shares", ticker, "data.csv"
+            )
+            raise AssertionError(
+                f"No closing price for share ticker {ticker} in {ticker_share_price} "
+                + f"on or before {date_utils.log_timestamp(end_time_in_ms)}"
+            )
+        closing_price_cache[(ticker, end_time_in_ms)] = float(history.closes[last_day])
 
-    return price_map[0]["fmv"]
+    return closing_price_cache[(ticker, end_time_in_ms)]
 
 
-def get_peak_price_in_inr(
-    ticker: str, start_time_in_ms: int, end_time_in_ms: int
-) -> float:
+def __init_peak_index(ticker: str) -> InrPeakIndex:
+    if ticker not in peak_index_cache:
+        history = __init_map(ticker)
+        inr_rates = rbi_rates_utils.get_rates_for_prev_mon(
+            ticker_currency_info[ticker], history.times_in_ms
+        )
+        inr_prices = history.closes * inr_rates
+        is_missing = np.isnan(inr_rates)
+
+        # a missing day never wins a comparison, the window holding it failing
+        # before its peak is read
+        values = np.where(is_missing, -np.inf, inr_prices)
+        levels = [np.arange(len(values), dtype=np.int64)]
+        width = 1
+        while 2 * width <= len(values):
+            previous = levels[-1]
+            left = previous[: len(values) - 2 * width + 1]
+            right = previous[width : len(values) - width + 1]
+            levels.append(np.where(values[right] >= values[left], right, left))
+            width *= 2
+
+        peak_index_cache[ticker] = InrPeakIndex(
+            inr_rates=inr_rates,
+            inr_prices=inr_prices,
+            missing_rate_counts=np.concatenate(
+                ([0], np.cumsum(is_missing, dtype=np.int64))
+            ),
+            levels=levels,
+        )
+
+    return peak_index_cache[ticker]
+
+
+def __peak_day(peak_index: InrPeakIndex, first_day: int, last_day: int) -> int:
+    """
+    Day holding the peak INR price over the inclusive range of days, as two
+    overlapping power of two windows of the sparse table
+    """
+    level = (last_day - first_day + 1).bit_length() - 1
+    left = int(peak_index.levels[level][first_day])
+    right = int(peak_index.levels[level][last_day - (1 << level) + 1])
+    if peak_index.inr_prices[right] >= peak_index.inr_prices[left]:
+        return right
+    return left
+
+
+def __peak_window(
+    ticker: str,
+    history: PriceHistory,
+    peak_index: InrPeakIndex,
+    start_time_in_ms: int,
+    end_time_in_ms: int,
+) -> t.Tuple[int, int]:
+    """
+    Inclusive range of trading days of the window, failing when it holds none or
+    holds a day without a reference rate
+    """
     if start_time_in_ms > end_time_in_ms:
         raise AssertionError(
             f"start_time_in_ms = {start_time_in_ms} is greater "
             + f"than equal to end_time_in_ms = {end_time_in_ms}"
         )
 
-    price_map = list(
-        filter(
-            lambda price: price["entry_time_in_millis"] <= end_time_in_ms
-            and price["entry_time_in_millis"] >= start_time_in_ms,
-            sorted(
-                __init_map(ticker),
-                key=lambda price: price["entry_time_in_millis"],
-                reverse=True,
-            ),
-        )
-    )
-    price_map_with_inr_rate: t.Iterator[TimedFmvWithInrRate] = map(
-        lambda price: {
-            **price,
-            "inr_rate": rbi_rates_utils.get_rate_for_prev_mon_for_time_in_ms(
-                ticker_currency_info[ticker], price["entry_time_in_millis"]
-            ),
-        },
-        price_map,
+    first_day = int(np.searchsorted(history.times_in_ms, start_time_in_ms, side="left"))
+    last_day = (
+        int(np.searchsorted(history.times_in_ms, end_time_in_ms, side="right")) - 1
     )
+    if first_day > last_day:
+        raise ValueError(
+            f"No FMV data for share ticker {ticker} from "
+            + f"{date_utils.log_timestamp(start_time_in_ms)} to "
+            + f"{date_utils.log_timestamp(end_time_in_ms)}"
+        )
+    if (
+        peak_index.missing_rate_counts[last_day + 1]
+        > peak_index.missing_rate_counts[first_day]
+    ):
+        missing_day = first_day + int(
+            np.argmax(np.isnan(peak_index.inr_rates[first_day : last_day + 1]))
+        )
+        # the rate lookup is what states the month the reference rate is missing for
+        rbi_rates_utils.get_rate_for_prev_mon_for_time_in_ms(
+            ticker_currency_info[ticker], int(history.times_in_ms[missing_day])
+        )
+    return first_day, last_day
 
-    max_value = max(
-        price_map_with_inr_rate, key=lambda price: price["fmv"] * price["inr_rate"]
-    )
 
-    peak_price_in_inr = max_value["fmv"] * max_value["inr_rate"]
+def __log_peak(
+    ticker: str,
+    history: PriceHistory,
+    peak_index: InrPeakIndex,
+    start_time_in_ms: int,
+    end_time_in_ms: int,
+    peak_day: int,
+) -> float:
+    fmv = float(history.closes[peak_day])
+    inr_rate = float(peak_index.inr_rates[peak_day])
+    peak_price_in_inr = float(peak_index.inr_prices[peak_day])
 
     logger.debug_log_json(
         {
             "start_time": date_utils.display_time(start_time_in_ms),
             "end_time": date_utils.display_time(end_time_in_ms),
-            "max_fmv($)": max_value["fmv"],
-            "max_fmv($)_at": date_utils.display_time(max_value["entry_time_in_millis"]),
-            "inr_conversion_rate": max_value["inr_rate"],
+            "max_fmv($)": fmv,
+            "max_fmv($)_at": date_utils.display_time(
+                int(history.times_in_ms[peak_day])
+            ),
+            "inr_conversion_rate": inr_rate,
             "effective_price(INR)": peak_price_in_inr,
         }
     )
@@ -188,7 +367,76 @@ def get_peak_price_in_inr(
     logger.log(
         f"Peak price for ticker = {ticker} from {date_utils.display_time(start_time_in_ms)} "
         + f"to {date_utils.display_time(end_time_in_ms)} is {peak_price_in_inr} "
-        + f"INR at rate {max_value['inr_rate']} INR/USD"
+        + f"INR at rate {inr_rate} INR/USD"
+    )
+
+    return peak_price_in_inr
+
+
+def get_peak_price_in_inr(
+    ticker: str, start_time_in_ms: int, end_time_in_ms: int
+) -> float:
+    history = __init_map(ticker)
+    peak_index = __init_peak_index(ticker)
+    first_day, last_day = __peak_window(
+        ticker, history, peak_index, start_time_in_ms, end_time_in_ms
+    )
+    return __log_peak(
+        ticker,
+        history,
+        peak_index,
+        start_time_in_ms,
+        end_time_in_ms,
+        __peak_day(peak_index, first_day, last_day),
     )
 
-    return max_value["fmv"] * max_value["inr_rate"]
+
+def get_peak_prices_in_inr(
+    ticker: str, start_times_in_ms: t.Sequence[int], end_time_in_ms: int
+) -> t.List[float]:
+    """
+    Peak INR price from each start up to the same end, in the order of the starts.
+    The windows share their right edge, so a single backward sweep from the end
+    carries the running peak of every one of them
+    """
+    if len(start_times_in_ms) == 0:
+        return []
+
+    history = __init_map(ticker)
+    peak_index = __init_peak_index(ticker)
+    windows = [
+        __peak_window(ticker, history, peak_index, start_time_in_ms, end_time_in_ms)
+        for start_time_in_ms in start_times_in_ms
+    ]
+    sweep_first_day = min(first_day for first_day, _ in windows)
+    last_day = windows[0][1]
+
+    # the sweep runs over the days reversed, so `suffix_peaks[i]` is the peak from
+    # `last_day - i` up to `last_day`. A day without a rate lies before every window
+    # it could fail, so it never wins
+    reversed_prices = np.where(
+        np.isnan(peak_index.inr_rates[sweep_first_day : last_day + 1]),
+        -np.inf,
+        peak_index.inr_prices[sweep_first_day : last_day + 1],
+    )[::-1]
+    suffix_peaks = np.maximum.accumulate(reversed_prices)
+    # a day sets a new peak only when it beats every later one, so on a tie the
+    # later day, the one swept first, keeps holding it
+    sets_peak = np.empty(len(reversed_prices), dtype=np.bool_)
+    sets_peak[0] = True
+    sets_peak[1:] = reversed_prices[1:] > suffix_peaks[:-1]
+    peak_positions = np.maximum.accumulate(
+        np.where(sets_peak, np.arange(len(reversed_prices)), 0)
+    )
+
+    return [
+        __log_peak(
+            ticker,
+            history,
+            peak_index,
+            start_time_in_ms,
+            end_time_in_ms,
+            last_day - int(peak_positions[last_day - first_day]),
+        )
+        for start_time_in_ms, (first_day, _) in zip(start_times_in_ms, windows)
+    ]